@@ -8,8 +8,19 @@ Retrieve and extract data from HTML documents.
     >>> resp = extr.extract(html)
     >>> print resp
 """
+import collections
 import urllib.parse
 import importlib
+import time
+
+from extraction import archive, batch, incremental, limits
+from extraction.cache import cache_key
+from extraction.document import Document
+from extraction.encoding import decode
+from extraction.parsers import DEFAULT_PARSER, get_parser
+from extraction.selectors import SelectorIndex
+from extraction.text import NormalizedText, truncate_text
+from extraction.urls import URLNormalizer
 
 
 # This is a debugging mechanism, and if enabled will add a hash
@@ -18,10 +29,67 @@ import importlib
 MARK_TECHNIQUE = False
 
 
+# techniques resolved by DictExtractor.resolve_techniques, along with
+# what is derived from them, replaced as a whole whenever they change
+Resolved = collections.namedtuple('Resolved', ('techniques', 'head_only', 'tags', 'selectors'))
+
+
+def add_unique(values, seen, new_values):
+    """
+    Append each of new_values which isn't already in values, preserving order.
+
+    `seen` is a set holding the hashable members of values, so that
+    checking for duplicates takes constant time. Unhashable values
+    fall back to scanning values.
+    """
+    for value in new_values:
+        try:
+            if value in seen:
+                continue
+            seen.add(value)
+        except TypeError:
+            if value in values:
+                continue
+        values.append(value)
+    return values
+
+
+def values_property(name):
+    """
+    Return a property exposing the values stored in the slot ``_<name>``.
+
+    Values are stored as tuples, and only copied into a list (which is
+    then kept) the first time the property is read.
+    """
+    slot = '_' + name
+
+    def get_values(self):
+        values = getattr(self, slot)
+        if type(values) is not list:
+            values = list(values)
+            setattr(self, slot, values)
+        return values
+
+    def set_values(self, values):
+        setattr(self, slot, values)
+
+    return property(get_values, set_values, doc="Return all extracted %s, best first." % name)
+
+
 class Extracted(object):
     "Contains data extracted from a page."
-
-    def __init__(self, titles=None, descriptions=None, images=None, videos=None, urls=None, feeds=None, **kwargs):
+    __slots__ = ('_titles', '_descriptions', '_images', '_videos', '_urls', '_feeds', '_truncated',
+                 '_unexpected_values')
+
+    titles = values_property('titles')
+    descriptions = values_property('descriptions')
+    images = values_property('images')
+    videos = values_property('videos')
+    urls = values_property('urls')
+    feeds = values_property('feeds')
+
+    def __init__(self, titles=None, descriptions=None, images=None, videos=None, urls=None, feeds=None,
+                 truncated=None, **kwargs):
         """
         Initialize Extracted instance.
 
@@ -53,19 +121,25 @@ class Extracted(object):
 
         Titles, descriptions and images should all be lists.
         The lists should be ordered best to worst.
+
+        `truncated` lists the limits, if any, which cut extraction
+        short, in which case the results may be incomplete.
+
+        To keep instances compact they are stored internally as tuples,
+        and copied into lists the first time they are accessed.
         """
         if titles is None:
-            titles = []
+            titles = ()
         if descriptions is None:
-            descriptions = []
+            descriptions = ()
         if images is None:
-            images = []
+            images = ()
         if videos is None:
-            videos = []
+            videos = ()
         if urls is None:
-            urls = []
+            urls = ()
         if feeds is None:
-            feeds = []
+            feeds = ()
 
         assert type(titles) in (list, tuple), "titles must be a list or tuple"
         assert type(descriptions) in (list, tuple), "descriptions must be a list or tuple"
@@ -74,12 +148,13 @@ class Extracted(object):
         assert type(urls) in (list, tuple), "urls must be a list or tuple"
         assert type(feeds) in (list, tuple), "feeds must be a list or tuple"
 
-        self.titles = titles
-        self.descriptions = descriptions
-        self.images = images
-        self.urls = urls
-        self.feeds = feeds
-        self.videos = videos
+        self._titles = tuple(titles)
+        self._descriptions = tuple(descriptions)
+        self._images = tuple(images)
+        self._urls = tuple(urls)
+        self._feeds = tuple(feeds)
+        self._videos = tuple(videos)
+        self._truncated = tuple(truncated or ())
 
         # stores unexpected and uncaptured values to avoid crashing if
         # a technique returns additional types of data
@@ -87,12 +162,12 @@ class Extracted(object):
 
     def __repr__(self):
         "String representation of extracted results."
-        details = (("title", self.titles),
-                   ("url", self.urls),
-                   ("image", self.images),
-                   ("videos", self.videos),
-                   ("description", self.descriptions),
-                   ("feed", self.feeds),
+        details = (("title", self._titles),
+                   ("url", self._urls),
+                   ("image", self._images),
+                   ("videos", self._videos),
+                   ("description", self._descriptions),
+                   ("feed", self._feeds),
                    )
 
         details_strs = []
@@ -108,51 +183,75 @@ class Extracted(object):
 
         return "<%s: %s>" % (self.__class__.__name__, ", ".join(details_strs))
 
+    def as_dict(self):
+        """
+        Return the extracted values as a dictionary, as ``DictExtractor`` would.
+
+        Types without any values are left out. Unexpected values, and
+        those stored by subclasses, are included alongside the others.
+        """
+        values = (("titles", self._titles),
+                  ("descriptions", self._descriptions),
+                  ("images", self._images),
+                  ("videos", self._videos),
+                  ("urls", self._urls),
+                  ("feeds", self._feeds),
+                  ("truncated", self._truncated))
+        extracted = dict((name, list(value)) for name, value in values if value)
+        extracted.update(self._unexpected_values)
+        extracted.update(getattr(self, '__dict__', {}))
+        return extracted
+
+    @property
+    def truncated(self):
+        "Return the limits which cut extraction short, such as ``['bytes']``."
+        return list(self._truncated)
+
     @property
     def title(self):
         "Return the best title, if any."
-        if self.titles:
-            return self.titles[0]
+        if self._titles:
+            return self._titles[0]
         else:
             return None
 
     @property
     def image(self):
         "Return the best image, if any."
-        if self.images:
-            return self.images[0]
+        if self._images:
+            return self._images[0]
         else:
             return None
 
     @property
     def video(self):
         "Return the best video, if any."
-        if self.videos:
-            return self.videos[0]
+        if self._videos:
+            return self._videos[0]
         else:
             return None
 
     @property
     def description(self):
         "Return the best description, if any."
-        if self.descriptions:
-            return self.descriptions[0]
+        if self._descriptions:
+            return self._descriptions[0]
         else:
             return None
 
     @property
     def url(self):
         "Return the best url, if any."
-        if self.urls:
-            return self.urls[0]
+        if self._urls:
+            return self._urls[0]
         else:
             return None
 
     @property
     def feed(self):
         "Return the best feed, if any."
-        if self.feeds:
-            return self.feeds[0]
+        if self._feeds:
+            return self._feeds[0]
         else:
             return None
 
@@ -177,37 +276,184 @@ class DictExtractor(object):
     url_types = ["images", "urls", "feeds", "videos"]
     text_types = ["titles", "descriptions"]
 
-    def __init__(self, techniques=None, strict_types=False, *args, **kwargs):
+    # backend from extraction.parsers used to build the document tree,
+    # one of "html5lib", "lxml", "html.parser" or "selectolax"
+    parser = DEFAULT_PARSER
+
+    # if True and every technique is head-only, stop parsing
+    # each page where its head ends
+    streaming = False
+
+    # if True and techniques only search title, meta and link tags,
+    # scan for them rather than parsing, see extraction.scanner
+    scan = False
+
+    # an extraction.cache.Cache for results, or None to disable caching
+    cache = None
+
+    # an extraction.instrument.Sink receiving timings and counts,
+    # or None to disable instrumentation
+    instrument = None
+
+    # limits on the work done for each document, see extraction.limits,
+    # where None means unlimited
+    max_bytes = None
+    max_nodes = None
+    technique_timeout = None
+
+    # descriptions are cut to at most this many characters, which also
+    # lets techniques stop reading long paragraphs early, or None
+    max_description_length = None
+
+    def __init__(self, techniques=None, strict_types=False, parser=None, streaming=None, cache=None,
+                 instrument=None, max_bytes=None, max_nodes=None, technique_timeout=None, scan=None,
+                 max_description_length=None, *args, **kwargs):
         "Extractor."
         self.strict_types = strict_types
-        if techniques:
-            self.techniques = techniques
+        if streaming is not None:
+            self.streaming = streaming
+        if scan is not None:
+            self.scan = scan
+        if cache is not None:
+            self.cache = cache
+        if instrument is not None:
+            self.instrument = instrument
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if max_nodes is not None:
+            self.max_nodes = max_nodes
+        if technique_timeout is not None:
+            self.technique_timeout = technique_timeout
+        if max_description_length is not None:
+            self.max_description_length = max_description_length
+        self.parser = parser or self.parser
+        self.techniques = techniques or self.techniques
 
         super(DictExtractor, self).__init__(*args, **kwargs)
 
-    def run_technique(self, technique, html):
+    def __setattr__(self, name, value):
         """
-        Run a given technique against the HTML.
+        Resolve techniques and parsers as soon as they are assigned.
+
+        They're resolved before being stored, so if that fails the
+        extractor keeps its previous techniques or parser.
+        """
+        if self.__dict__.get('_frozen'):
+            raise AttributeError("can't set %r, %s is frozen" % (name, type(self).__name__))
+        if name == 'techniques':
+            self.resolve_techniques(value)
+        elif name == 'parser':
+            self.parse = get_parser(value)
+        super(DictExtractor, self).__setattr__(name, value)
+
+    def __getstate__(self):
+        "Pickle configuration only, resolved techniques are rebuilt when unpickled."
+        state = self.__dict__.copy()
+        for name in ('parse', '_resolved'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        "Restore a pickled extractor, resolving its parser and techniques once."
+        state = dict(state)
+        frozen = state.pop('_frozen', False)
+        self.__dict__.update(state)
+        self.parser = self.parser
+        self.techniques = self.techniques
+        if frozen:
+            self.freeze()
+
+    def freeze(self):
+        """
+        Prevent any further changes to the extractor's configuration, and return it.
+
+            >>> extractor = Extractor(cache=LRUCache()).freeze()
+
+        Extracting never modifies an extractor or its techniques, so a
+        frozen extractor can be shared by any number of threads without
+        locking. Freezing makes sure nothing else changes it either:
+        assigning any attribute raises an ``AttributeError``, and
+        `techniques` becomes a tuple so it can't be changed in place.
+        Freezing a frozen extractor does nothing.
+        """
+        if self.__dict__.get('_frozen'):
+            return self
+        self.techniques = tuple(self.techniques)
+        self._frozen = True
+        return self
+
+    def technique_class(self, technique):
+        """
+        Return the class for a technique.
 
         Technique is a string including the full module path
         and class name for the technique, for example::
 
             extraction.techniques.FacebookOpengraphTags
-
-        HTML is a string representing an HTML document.
         """
         technique_path_parts = technique.split('.')
         assert len(technique_path_parts) > 1, "technique_path_parts must include a module and a class"
         technique_module_path = ".".join(technique_path_parts[:-1])
         technique_class_name = technique_path_parts[-1]
         technique_module = importlib.import_module(technique_module_path)
-        technique_class = getattr(technique_module, technique_class_name)
-        technique_inst = technique_class(extractor=self)
+        return getattr(technique_module, technique_class_name)
+
+    def resolve_techniques(self, techniques=None):
+        """
+        Import and instantiate every technique in `techniques`, defaulting to the extractor's.
+
+        This happens whenever `techniques` is assigned, so a bad technique
+        path fails immediately rather than on the first page, and every
+        page reuses the same technique instances. Modifying the list in
+        place doesn't resolve it again, so assign a new list instead.
+
+        The ``selectors`` of declarative techniques are compiled into
+        one ``SelectorIndex``, so they're resolved together on each page.
+        Everything resolved is replaced in a single assignment, so pages
+        being extracted meanwhile see either the old or new techniques.
+        """
+        if techniques is None:
+            techniques = self.techniques
+        resolved = tuple((technique, self.technique_class(technique)(extractor=self))
+                         for technique in techniques)
+        self._resolved = Resolved(
+            techniques=resolved,
+            head_only=all(getattr(x, 'head_only', False) for _, x in resolved),
+            tags=frozenset(tag for _, x in resolved for tag in getattr(x, 'tags', ())),
+            selectors=SelectorIndex([x for _, x in resolved if getattr(x, 'selectors', None)]))
+
+    def run_technique(self, technique, html):
+        """
+        Run a given technique against the HTML.
+
+        Technique is a string including the full module path
+        and class name for the technique, and HTML is a string
+        representing an HTML document.
+
+        Subclasses may override this to wrap each technique. Otherwise
+        it isn't called, and the resolved techniques are run directly.
+        """
+        for technique_path, technique_inst in self._resolved.techniques:
+            if technique_path == technique:
+                break
+        else:
+            technique_inst = self.technique_class(technique)(extractor=self)
         return technique_inst.extract(html)
 
+    def head_only(self):
+        "Return True if every technique only needs the head of a page."
+        return self._resolved.head_only
+
+    def technique_tags(self):
+        "Return the names of all tags the techniques are interested in."
+        return self._resolved.tags
+
     def cleanup_text(self, value, mark):
         "Cleanup text values like titles or descriptions."
-        text = u" ".join(value.strip().split())
+        if type(value) is NormalizedText:
+            text = value
+        else:
+            text = u" ".join(value.strip().split())
         if mark:
             text = u"%s %s" % (mark, text)
         return text
@@ -231,7 +477,22 @@ class DictExtractor(object):
             url = url + mark
         return url
 
-    def cleanup(self, results, source_url=None, technique=""):
+    def cleanup_urls(self, values, normalizer, mark):
+        """
+        Transform a list of relative URLs into absolute URLs if possible.
+
+        Equivalent to calling ``cleanup_url`` on each value, but uses
+        a ``URLNormalizer`` which parses the source URL only once. If a
+        subclass overrides ``cleanup_url``, it is called for each value.
+        """
+        if type(self).cleanup_url is not DictExtractor.cleanup_url:
+            return [self.cleanup_url(x, normalizer.source_url, mark) for x in values]
+        urls = normalizer.normalize_all(values)
+        if mark:
+            urls = [x + mark for x in urls]
+        return urls
+
+    def cleanup(self, results, source_url=None, technique="", normalizer=None):
         """
         Allows standardizing extracted contents, at this time:
 
@@ -240,29 +501,31 @@ class DictExtractor(object):
         3. filter out duplicate values
         4. marks the technique that produced the result
         5. returns only specified text_types and url_types depending on self.strict_types
+
+        `normalizer` is a ``URLNormalizer`` for `source_url`, which can
+        be shared between calls to reuse its parsed URL and results.
         """
         cleaned_results = {}
         mark = MARK_TECHNIQUE and u"#" + technique.split('.')[-1]
+        if normalizer is None:
+            normalizer = URLNormalizer(source_url)
 
         for data_type, data_values in results.items():
             if data_type in self.text_types:
                 data_values = [self.cleanup_text(x, mark) for x in filter(None, data_values)]
+                if data_type == 'descriptions' and self.max_description_length is not None:
+                    data_values = [truncate_text(x, self.max_description_length) for x in data_values]
             elif data_type in self.url_types:
-                data_values = [self.cleanup_url(x, source_url, mark) for x in data_values]
+                data_values = self.cleanup_urls(data_values, normalizer, mark)
             elif self.strict_types:
                 continue
 
             # filter out duplicate values
-            unique_values = []
-            for data_value in data_values:
-                if data_value not in unique_values:
-                    unique_values.append(data_value)
-
-            cleaned_results[data_type] = unique_values
+            cleaned_results[data_type] = add_unique([], set(), data_values)
 
         return cleaned_results
 
-    def extract(self, html, source_url=None):
+    def extract(self, html, source_url=None, best_only=None, fields=None, content_type=None):
         """
         Extracts contents from an HTML document.
 
@@ -275,21 +538,233 @@ class DictExtractor(object):
         `source_url` is optional, but allows for a certain level of
         cleanup to be performed, such as converting relative URLs
         into absolute URLs and such.
+
+        `html` may also be ``bytes`` or a ``memoryview``, in which case
+        it is decoded using the charset from `content_type` (the HTTP
+        Content-Type header) or sniffed from the document itself.
+
+        `best_only` is an optional list of data types, such as
+        ``["titles", "images"]``, for callers which only want the
+        best value of each. Because earlier techniques outrank later
+        ones, no further techniques are run once every one of those
+        data types has a value::
+
+            >>> extracted = Extractor().extract(html, best_only=["titles", "images"])
+            >>> print extracted.title, extracted.image
+
+        `fields` is an optional list of data types to extract. Only
+        those data types are returned, and techniques or tag searches
+        which can't produce any of them are skipped entirely::
+
+            >>> extracted = Extractor().extract(html, fields=["titles", "images"])
+
+        If the extractor has a `cache`, results are looked up by a hash
+        of the HTML, `source_url` and the extractor's configuration.
+
+        If the extractor has limits (`max_bytes`, `max_nodes` or
+        `technique_timeout`) and a document exceeds them, the results
+        include ``truncated``, a list of the limits which were hit.
+        Results cut short by a timeout aren't cached.
+        """
+        if self.cache is None:
+            return self.run_techniques(html, source_url=source_url, best_only=best_only,
+                                       fields=fields, content_type=content_type)
+
+        config = self.cache_config() + (sorted(best_only) if best_only else None,
+                                        sorted(fields) if fields is not None else None,
+                                        content_type)
+        key = cache_key(html, source_url, config)
+        extracted = self.cache.get(key)
+        if extracted is None:
+            extracted = self.run_techniques(html, source_url=source_url, best_only=best_only,
+                                            fields=fields, content_type=content_type)
+            if limits.TIMEOUT not in extracted.get('truncated', ()):
+                self.cache.set(key, dict((k, list(v)) for k, v in extracted.items()))
+            return extracted
+        return dict((k, list(v)) for k, v in extracted.items())
+
+    def cache_config(self):
+        "Return a tuple of the configuration which affects extracted results."
+        return (self.__class__.__module__, self.__class__.__name__, tuple(self.techniques),
+                self.strict_types, self.parser, self.streaming,
+                self.max_bytes, self.max_nodes, self.technique_timeout, self.max_description_length)
+
+    def run_techniques(self, html, source_url=None, best_only=None, fields=None, content_type=None,
+                       reuse=None, results=None):
         """
+        Run techniques against an HTML document and merge their results.
+
+        The HTML is wrapped in a ``Document`` so that all techniques
+        share a single parsed tree, which is walked once to gather the
+        tags every technique is interested in. When `streaming` is
+        enabled and every technique is head-only, only the head is parsed.
+
+        If `best_only` is given, stop running techniques as soon as
+        each of its data types has a value. If `fields` is given, only
+        run techniques which can produce at least one of those data types.
+
+        HTML passed as bytes is decoded first, and in streaming mode with
+        only head-only techniques, the body is never decoded.
+
+        If the extractor has an `instrument`, timings and counts for
+        the document and each technique are reported to it.
+
+        Documents over `max_bytes` or `max_nodes` are truncated before
+        parsing. A technique can't be interrupted, so when one takes
+        longer than `technique_timeout` seconds, excluding parsing, its
+        results are kept but the remaining techniques are skipped.
+
+        `reuse` is an optional dictionary of a technique's position in
+        the techniques run to cleaned-up results from an earlier run,
+        which are merged instead of running the technique. If `results`
+        is a dictionary, each technique's cleaned-up results are stored
+        in it by position.
+        """
+        instrument = self.instrument
+        resolved = self._resolved
+        techniques = resolved.techniques
+        head_only = resolved.head_only
+        tags = resolved.tags
+        if fields is not None:
+            fields = frozenset(fields)
+            techniques = [(x, inst) for x, inst in techniques
+                          if getattr(inst, 'fields', None) is None or fields.intersection(inst.fields)]
+            head_only = all(getattr(inst, 'head_only', False) for _, inst in techniques)
+            tags = frozenset(tag for _, inst in techniques for tag in getattr(inst, 'tags', ()))
+
+        if instrument is not None:
+            instrument.record('document_bytes', len(html))
+        truncated = []
+        if self.max_bytes is not None and not isinstance(html, Document):
+            cut = limits.truncate_bytes(html, self.max_bytes)
+            if cut is not None:
+                html = cut
+                truncated.append(limits.BYTES)
+        if isinstance(html, (bytes, bytearray, memoryview)):
+            html = decode(html, content_type=content_type, head_only=self.streaming and head_only)
+        if self.max_nodes is not None and not isinstance(html, Document):
+            cut = limits.truncate_nodes(html, self.max_nodes)
+            if cut is not None:
+                html = cut
+                truncated.append(limits.NODES)
+        if not isinstance(html, Document):
+            html = Document(html, parse=self.parse, head_only=self.streaming and head_only,
+                            tags=tags, fields=fields, selectors=resolved.selectors, scan=self.scan)
         extracted = {}
-        for technique in self.techniques:
-            technique_extracted = self.run_technique(technique, html)
-            technique_cleaned = self.cleanup(technique_extracted, source_url=source_url, technique=technique)
+        seen = {}
+        normalizer = URLNormalizer(source_url)
+        technique_timeout = self.technique_timeout
+        overridden = type(self).run_technique is not DictExtractor.run_technique
+        for position, (technique, technique_inst) in enumerate(techniques):
+            if technique_timeout is not None:
+                parse_seconds = html.parse_seconds
+                start = time.perf_counter()
+            if instrument is not None:
+                kept = sum(len(x) for x in extracted.values())
+
+            if reuse and position in reuse:
+                technique_cleaned = reuse[position]
+            elif instrument is None:
+                if overridden:
+                    technique_extracted = self.run_technique(technique, html)
+                else:
+                    technique_extracted = technique_inst.extract(html)
+                technique_cleaned = self.cleanup(technique_extracted, source_url=source_url, technique=technique,
+                                                 normalizer=normalizer)
+            else:
+                technique_cleaned = self.run_instrumented(instrument, technique, technique_inst, html,
+                                                          source_url, normalizer)
+            if results is not None:
+                results[position] = technique_cleaned
+
             for data_type, data_values in technique_cleaned.items():
                 if data_values:
                     if data_type not in extracted:
                         extracted[data_type] = []
+                        seen[data_type] = set()
 
                     # don't include duplicate values
-                    unique_data_values = [x for x in data_values if x not in extracted[data_type]]
-                    extracted[data_type] += unique_data_values
+                    add_unique(extracted[data_type], seen[data_type], data_values)
+
+            if instrument is not None:
+                instrument.record('kept', sum(len(x) for x in extracted.values()) - kept, technique)
+
+            if best_only and all(x in extracted for x in best_only):
+                break
+
+            if technique_timeout is not None:
+                elapsed = time.perf_counter() - start - (html.parse_seconds - parse_seconds)
+                if elapsed > technique_timeout:
+                    truncated.append(limits.TIMEOUT)
+                    break
+
+        if fields is not None:
+            extracted = dict((k, v) for k, v in extracted.items() if k in fields)
+        if truncated:
+            extracted['truncated'] = truncated
         return extracted
 
+    def run_instrumented(self, instrument, technique, technique_inst, html, source_url, normalizer=None):
+        "Run and clean up a single technique, reporting measurements to `instrument`."
+        parse_seconds = html.parse_seconds
+        start = time.perf_counter()
+        if type(self).run_technique is not DictExtractor.run_technique:
+            technique_extracted = self.run_technique(technique, html)
+        else:
+            technique_extracted = technique_inst.extract(html)
+        extracted_at = time.perf_counter()
+        technique_cleaned = self.cleanup(technique_extracted, source_url=source_url, technique=technique,
+                                         normalizer=normalizer)
+        cleaned_at = time.perf_counter()
+
+        parsed = html.parse_seconds - parse_seconds
+        if parsed:
+            instrument.record('parse_seconds', parsed)
+        instrument.record('technique_seconds', extracted_at - start - parsed, technique)
+        instrument.record('cleanup_seconds', cleaned_at - extracted_at, technique)
+        instrument.record('candidates', sum(len(x) for x in technique_extracted.values()), technique)
+        return technique_cleaned
+
+    def extract_incremental(self, html, fingerprint=None, source_url=None, content_type=None):
+        """
+        Extract a page, reusing the results of techniques unaffected by changes since it was last extracted.
+
+            >>> extracted, fingerprint = Extractor().extract_incremental(html, source_url=url)
+            >>> extracted, fingerprint = Extractor().extract_incremental(new_html, fingerprint, source_url=url)
+
+        Returns the extracted results and a fingerprint to pass in
+        when the page is next extracted, see ``extraction.incremental``.
+        """
+        return incremental.extract_incremental(self, html, fingerprint=fingerprint, source_url=source_url,
+                                               content_type=content_type)
+
+    def extract_many(self, documents, workers=None, chunksize=16, ordered=True, prefetch=2,
+                     return_exceptions=False):
+        """
+        Extract an iterable of (html, source_url) pairs across a process pool.
+
+            >>> pages = [(html, url), (other_html, other_url)]
+            >>> for extracted in Extractor().extract_many(pages, workers=4):
+            ...     print extracted.title
+
+        Each worker receives this extractor once and reuses it for every
+        page. See ``extraction.batch.extract_many`` for the options.
+        """
+        return batch.extract_many(self, documents, workers=workers, chunksize=chunksize,
+                                  ordered=ordered, prefetch=prefetch, return_exceptions=return_exceptions)
+
+    def extract_archive(self, path, **kwargs):
+        """
+        Extract every HTML page in a WARC archive, yielding (record_id, extracted) pairs.
+
+            >>> for record_id, extracted in Extractor().extract_archive("crawl.warc"):
+            ...     print record_id, extracted.title
+
+        The archive is memory-mapped and pages are extracted from slices
+        of it, see ``extraction.archive`` for details.
+        """
+        return archive.extract_archive(self, path, **kwargs)
+
 
 class Extractor(DictExtractor):
     """
@@ -309,6 +784,11 @@ class Extractor(DictExtractor):
         extract_dict = super(Extractor, self).extract(*args, **kwargs)
         return self.extracted_class(**extract_dict)
 
+    def extract_incremental(self, *args, **kwargs):
+        "Extract contents from an HTML document, reusing results from its previous version."
+        extract_dict, fingerprint = super(Extractor, self).extract_incremental(*args, **kwargs)
+        return self.extracted_class(**extract_dict), fingerprint
+
 
 class SvvenExtractor(DictExtractor):
     "Example subclass for Svven news aggregator."
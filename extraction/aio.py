@@ -0,0 +1,157 @@
+"""
+Extract documents from asyncio code without blocking the event loop.
+
+    >>> from extraction.aio import AsyncExtractor
+    >>> async_extractor = AsyncExtractor(max_in_flight=32, timeout=5)
+    >>> extracted = await async_extractor.extract(html, source_url=url)
+
+Parsing runs on an executor, by default a pool of threads. Passing
+``executor="process"`` instead runs it in a pool of processes, each
+of which receives the extractor once when it starts.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import functools
+
+from extraction import Extractor, batch
+
+
+class AsyncExtractor(object):
+    "Wraps an extractor with coroutines which offload parsing to an executor."
+
+    def __init__(self, extractor=None, executor=None, max_workers=None, max_in_flight=16, timeout=None):
+        """
+        Create an AsyncExtractor.
+
+        `extractor` defaults to an ``Extractor`` with the default techniques.
+        `executor` is "thread", "process" or a ``concurrent.futures.Executor``,
+        and defaults to a pool of `max_workers` threads. At most `max_in_flight`
+        documents are extracted at once; further calls wait for a slot, which
+        applies backpressure to their callers. `timeout` is the default number
+        of seconds to wait for each document.
+        """
+        self.extractor = extractor or Extractor()
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.owns_executor = not isinstance(executor, concurrent.futures.Executor)
+        if executor is None or executor == "thread":
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+            self.run = self.extractor.extract
+        elif executor == "process":
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers,
+                                                                   initializer=batch.init_worker,
+                                                                   initargs=(self.extractor,))
+            self.run = batch.extract_one
+        elif isinstance(executor, concurrent.futures.Executor):
+            # the extractor is pickled with each document if this is a
+            # process pool, use executor="process" to avoid that
+            self.executor = executor
+            self.run = self.extractor.extract
+        else:
+            raise ValueError("executor must be 'thread', 'process' or an Executor")
+        # memoryviews can't be sent to worker processes, so are copied into bytes
+        self.copy_views = isinstance(self.executor, concurrent.futures.ProcessPoolExecutor)
+        self._semaphore = None
+
+    @property
+    def semaphore(self):
+        "Semaphore limiting in-flight documents, created within the running loop."
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    async def extract(self, html, source_url=None, timeout=None, content_type=None):
+        """
+        Extract contents from an HTML document on the executor.
+
+        Raises ``asyncio.TimeoutError`` if extraction takes longer than
+        `timeout` seconds (or the AsyncExtractor's default timeout).
+        Cancelling the coroutine, or timing out, cancels the document
+        if it hasn't started yet. A document which is already being
+        parsed runs to completion on its worker and its result is
+        discarded, but it keeps its in-flight slot until it finishes.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if self.copy_views and isinstance(html, memoryview):
+            html = bytes(html)
+        loop = asyncio.get_running_loop()
+        semaphore = self.semaphore
+        await semaphore.acquire()
+        try:
+            future = self.executor.submit(self.run, html, source_url=source_url, content_type=content_type)
+        except BaseException:
+            semaphore.release()
+            raise
+        future.add_done_callback(functools.partial(_release, loop, semaphore))
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    async def extract_many(self, documents, timeout=None, return_exceptions=False):
+        """
+        Extract an iterable or async iterable of (html, source_url) pairs.
+
+        Documents may also be bare strings, or (html, source_url,
+        content_type) triples for bytes with an HTTP Content-Type header.
+
+        Results are yielded in the same order as `documents`, and
+        documents are only pulled from `documents` while fewer than
+        `max_in_flight` are pending. If `return_exceptions` is True
+        then failures, including timeouts, are yielded in place of
+        results rather than raised.
+        """
+        pending = collections.deque()
+        try:
+            async for document in _aiter(documents):
+                if isinstance(document, batch.DOCUMENT_TYPES):
+                    document = (document, None)
+                html, source_url, content_type = tuple(document) + (None,) * (3 - len(document))
+                if len(pending) >= self.max_in_flight:
+                    yield await self._result(pending.popleft(), return_exceptions)
+                pending.append(asyncio.ensure_future(self.extract(html, source_url=source_url, timeout=timeout,
+                                                                  content_type=content_type)))
+            while pending:
+                yield await self._result(pending.popleft(), return_exceptions)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _result(self, task, return_exceptions):
+        if not return_exceptions:
+            return await task
+        try:
+            return await task
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            return exc
+
+    def close(self, wait=True):
+        "Shut down the executor, if the AsyncExtractor created it."
+        if self.owns_executor:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close(wait=False)
+
+
+def _release(loop, semaphore, future):
+    "Release an in-flight slot once an executor future finishes."
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # the event loop has already been closed
+        pass
+
+
+async def _aiter(documents):
+    "Iterate over an iterable or an async iterable."
+    if hasattr(documents, '__aiter__'):
+        async for document in documents:
+            yield document
+    else:
+        for document in documents:
+            yield document
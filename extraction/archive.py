@@ -0,0 +1,202 @@
+"""
+Extract pages stored in WARC archives.
+
+    >>> from extraction import Extractor
+    >>> for record_id, extracted in Extractor().extract_archive("crawl.warc"):
+    ...     print record_id, extracted.title
+
+Archives are memory-mapped rather than read into memory, and each
+record's payload is handed to the extractor as a ``memoryview`` slice
+of the map, so memory use stays roughly constant however large the
+archive is. Only uncompressed archives can be mapped, so decompress
+``.warc.gz`` files first.
+"""
+import gzip
+import mmap
+import os
+import zlib
+
+
+# content types of HTML payloads, other payloads are skipped
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+# most bytes searched for the end of a response's HTTP headers
+MAX_HEADER_BYTES = 65536
+
+# raised decoding a corrupt chunked or compressed response body
+DECODING_ERRORS = (ValueError, EOFError, OSError, zlib.error)
+
+
+def parse_headers(block):
+    """
+    Parse a block of header lines into a dictionary with lowercase names.
+
+    The first line, holding the WARC version or HTTP status, is skipped.
+    """
+    headers = {}
+    for line in bytes(block).decode('latin-1').split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if name:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def content_length(headers, available):
+    """
+    Return a record's Content-Length, or None if it is missing or malformed.
+
+    Lengths longer than the `available` bytes left in the file, as in a
+    truncated archive, are malformed too.
+    """
+    try:
+        length = int(headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+    if length < 0 or length > available:
+        return None
+    return length
+
+
+def iter_records(path):
+    """
+    Yield (headers, payload) for each record in the WARC file at `path`.
+
+    `headers` is a dictionary of the record's WARC headers, with
+    lowercase names, and `payload` is a ``memoryview`` over the mapped
+    file. Payloads are released once the next record is requested, so
+    copy them with ``bytes(payload)`` if you need to keep them.
+
+    Records without a valid Content-Length are skipped, resuming at the
+    next record which follows a blank line.
+    """
+    with open(path, 'rb') as archive:
+        if os.fstat(archive.fileno()).st_size == 0:
+            return
+        mapped = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            position = 0
+            while True:
+                start = mapped.find(b"WARC/", position)
+                if start == -1:
+                    break
+                header_end = mapped.find(b"\r\n\r\n", start)
+                if header_end == -1:
+                    break
+                headers = parse_headers(view[start:header_end])
+                payload_start = header_end + 4
+                length = content_length(headers, len(mapped) - payload_start)
+                if length is None:
+                    next_record = mapped.find(b"\r\n\r\nWARC/", payload_start)
+                    if next_record == -1:
+                        break
+                    position = next_record + 4
+                    continue
+                payload_end = payload_start + length
+                payload = view[payload_start:payload_end]
+                try:
+                    yield headers, payload
+                finally:
+                    payload.release()
+                position = payload_end
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                # a payload is still referenced elsewhere, and the map
+                # is closed once the last of them is freed
+                pass
+
+
+def dechunk(body):
+    "Decode a body sent with chunked transfer-encoding."
+    decoded = []
+    position = 0
+    while True:
+        line_end = body.find(b"\r\n", position)
+        if line_end == -1:
+            break
+        size = int(body[position:line_end].split(b";")[0] or b"0", 16)
+        if size == 0:
+            break
+        decoded.append(body[line_end + 2:line_end + 2 + size])
+        position = line_end + 4 + size
+    return b"".join(decoded)
+
+
+def http_payload(payload):
+    """
+    Split the payload of a WARC response record into (headers, body).
+
+    The body is a slice of `payload` unless it was sent chunked or
+    compressed, in which case it is decoded into a new bytes object.
+    Corrupt bodies raise one of ``DECODING_ERRORS``.
+    """
+    # headers are small, so only their neighbourhood is copied to search
+    header_end = bytes(payload[:MAX_HEADER_BYTES]).find(b"\r\n\r\n")
+    if header_end == -1:
+        return {}, payload[len(payload):]
+    headers = parse_headers(payload[:header_end])
+    body = payload[header_end + 4:]
+    chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+    encoding = headers.get("content-encoding", "").lower()
+    if not chunked and encoding not in ("gzip", "x-gzip", "deflate"):
+        return headers, body
+    # copied and released first, so a corrupt body can't keep the map open
+    with body:
+        body = bytes(body)
+    if chunked:
+        body = dechunk(body)
+    if encoding in ("gzip", "x-gzip"):
+        body = gzip.decompress(body)
+    elif encoding == "deflate":
+        body = zlib.decompress(body)
+    return headers, body
+
+
+def iter_pages(path, errors=None):
+    """
+    Yield (record_id, source_url, html, content_type) for each HTML page in a WARC file.
+
+    Pages come from ``response`` records holding HTTP responses and
+    from ``resource`` records. `html` is a ``memoryview`` which is only
+    valid until the next page is requested.
+
+    Responses whose bodies can't be decoded are skipped, and if `errors`
+    is given it is called with the record's id and the exception.
+    """
+    for headers, payload in iter_records(path):
+        record_type = headers.get("warc-type")
+        if record_type == "response":
+            try:
+                http_headers, html = http_payload(payload)
+            except DECODING_ERRORS as e:
+                if errors is not None:
+                    errors(headers.get("warc-record-id"), e)
+                continue
+            content_type = http_headers.get("content-type", "")
+        elif record_type == "resource":
+            html = payload
+            content_type = headers.get("content-type", "")
+        else:
+            continue
+        if content_type and not content_type.lower().startswith(HTML_CONTENT_TYPES):
+            continue
+        try:
+            yield headers.get("warc-record-id"), headers.get("warc-target-uri"), html, content_type or None
+        finally:
+            if isinstance(html, memoryview):
+                html.release()
+
+
+def extract_archive(extractor, path, **kwargs):
+    """
+    Yield (record_id, extracted) for each HTML page in the WARC file at `path`.
+
+    Each page is extracted with its target URI as the `source_url`
+    and its HTTP Content-Type as the `content_type`. Additional keyword
+    arguments, such as `fields`, are passed through to ``extract``.
+    """
+    for record_id, source_url, html, content_type in iter_pages(path):
+        yield record_id, extractor.extract(html, source_url=source_url, content_type=content_type, **kwargs)
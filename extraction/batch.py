@@ -0,0 +1,149 @@
+"""
+Extract many documents in parallel across a pool of processes.
+
+Usually used through ``DictExtractor.extract_many``::
+
+    >>> extractor = extraction.Extractor()
+    >>> pages = [(html, url) for url, html in crawled]
+    >>> for extracted in extractor.extract_many(pages, workers=8):
+    ...     print(extracted.title)
+
+Each worker process receives a copy of the extractor once, when it
+starts, and reuses it (and its resolved techniques) for every page.
+"""
+import collections
+import concurrent.futures
+import itertools
+import os
+
+
+# types of documents given on their own, without a source_url
+DOCUMENT_TYPES = (str, bytes, bytearray, memoryview)
+
+# extractor used by this worker process, installed by init_worker
+_worker_extractor = None
+
+
+def init_worker(extractor):
+    "Install the extractor used by the current worker process."
+    global _worker_extractor
+    _worker_extractor = extractor
+
+
+def extract_one(html, source_url=None, content_type=None):
+    "Extract a single document in the current worker process."
+    return _worker_extractor.extract(html, source_url=source_url, content_type=content_type)
+
+
+def extract_chunk(chunk, extractor=None, return_exceptions=False):
+    """
+    Extract a list of (html, source_url) pairs in the current worker process.
+
+    Documents may also be (html, source_url, content_type) triples, for
+    bytes whose encoding is given by an HTTP Content-Type header. Each
+    is extracted with `extractor` if it is given, rather than the
+    extractor installed in the worker. If `return_exceptions` is True
+    then a document which fails has its exception returned in place of
+    its result, rather than failing the whole chunk.
+    """
+    extractor = extractor or _worker_extractor
+    results = []
+    for document in chunk:
+        try:
+            if len(document) > 2:
+                results.append(extractor.extract(document[0], source_url=document[1], content_type=document[2]))
+            else:
+                results.append(extractor.extract(document[0], source_url=document[1]))
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
+
+
+def chunked(documents, chunksize):
+    """
+    Split documents into lists of at most chunksize (html, source_url) pairs.
+
+    Documents which are bare strings or bytes are treated as having no source_url.
+    """
+    documents = iter(documents)
+    while True:
+        chunk = list(itertools.islice(documents, chunksize))
+        if not chunk:
+            return
+        yield [(x, None) if isinstance(x, DOCUMENT_TYPES) else tuple(x) for x in chunk]
+
+
+def picklable(chunk):
+    "Return a chunk with memoryviews, which can't be sent to worker processes, copied into bytes."
+    return [(bytes(x[0]),) + x[1:] if isinstance(x[0], memoryview) else x for x in chunk]
+
+
+def extract_many(extractor, documents, workers=None, chunksize=16, ordered=True, prefetch=2,
+                 return_exceptions=False):
+    """
+    Extract an iterable of (html, source_url) pairs using a process pool.
+
+    Documents may also be (html, source_url, content_type) triples, as
+    accepted by ``extract_chunk``.
+
+    `workers` is the number of processes, defaulting to one per CPU,
+    and if it is 0 documents are extracted in the current process.
+    Documents are sent to workers `chunksize` at a time, and at most
+    `prefetch` chunks per worker are in flight at once, so very large
+    or unbounded iterables are consumed lazily.
+
+    If `ordered` is True results are yielded in the same order as
+    `documents`, otherwise ``(index, result)`` pairs are yielded as
+    soon as they complete, where index is the document's position in
+    `documents`. If `return_exceptions` is True then failures are
+    yielded in place of results rather than raised.
+    """
+    chunks = chunked(documents, chunksize)
+    if workers == 0:
+        index = 0
+        for chunk in chunks:
+            for result in extract_chunk(chunk, extractor, return_exceptions):
+                yield result if ordered else (index, result)
+                index += 1
+        return
+
+    chunks = map(picklable, chunks)
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * prefetch
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                      initializer=init_worker,
+                                                      initargs=(extractor,))
+    try:
+        if ordered:
+            pending = collections.deque()
+            for chunk in chunks:
+                pending.append(executor.submit(extract_chunk, chunk, return_exceptions=return_exceptions))
+                if len(pending) >= max_pending:
+                    for result in pending.popleft().result():
+                        yield result
+            while pending:
+                for result in pending.popleft().result():
+                    yield result
+        else:
+            pending = {}
+            start = 0
+            chunks_left = True
+            while chunks_left or pending:
+                while chunks_left and len(pending) < max_pending:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        chunks_left = False
+                        break
+                    pending[executor.submit(extract_chunk, chunk, return_exceptions=return_exceptions)] = start
+                    start += len(chunk)
+                if not pending:
+                    break
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    for offset, result in enumerate(future.result()):
+                        yield index + offset, result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1 @@
+"Benchmarks for measuring extraction performance, run with ``python -m``."
@@ -0,0 +1,106 @@
+"""
+Generated corpus of pages resembling real ones, for benchmarking.
+
+Pages are built from a seeded random number generator, so a given
+seed and size always produce the same corpus. Each page takes after
+one of a few kinds of real page:
+
+* ``article``: a long body of paragraphs in a deeply nested article
+* ``gallery``: hundreds of images in nested figures
+* ``meta``: a head crowded with Open Graph, Twitter and other meta tags
+* ``portal``: a bit of everything, with navigation, scripts and styles
+"""
+import random
+
+
+KINDS = ("article", "gallery", "meta", "portal")
+
+WORDS = ("the", "extraction", "of", "structured", "data", "from", "html", "pages", "is", "a", "surprisingly",
+         "fiddly", "problem", "because", "real", "documents", "are", "messy", "and", "rarely", "follow", "any",
+         "one", "convention", "for", "titles", "descriptions", "images", "or", "canonical", "urls", "café",
+         "naïve", "résumé", "über")
+
+
+def words(rng, count):
+    "Return `count` random words joined by spaces."
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def paragraphs(rng, count, min_words=40, max_words=160):
+    return "\n".join("<p>%s <a href=\"/p/%d\">%s</a> %s.</p>" % (words(rng, rng.randint(min_words, max_words)),
+                                                                  rng.randint(0, 10 ** 6), words(rng, 3),
+                                                                  words(rng, rng.randint(5, 20)))
+                     for _ in range(count))
+
+
+def nested(html, depth, tag="div"):
+    "Wrap html in `depth` levels of `tag`."
+    return "".join('<%s class="level-%d">' % (tag, i) for i in range(depth)) + html + ("</%s>" % tag) * depth
+
+
+def images(rng, count):
+    return "\n".join('<figure><img src="http://img.example.com/%d/%d.jpg" alt="%s" width="%d" height="%d">'
+                     '<figcaption>%s</figcaption></figure>' % (rng.randint(0, 999), i, words(rng, 4),
+                                                               rng.randint(100, 2000), rng.randint(100, 2000),
+                                                               words(rng, 8))
+                     for i in range(count))
+
+
+def meta_tags(rng, count, url):
+    tags = ['<meta charset="utf-8">',
+            '<meta name="description" content="%s">' % words(rng, 30),
+            '<meta property="og:title" content="%s">' % words(rng, 6),
+            '<meta property="og:description" content="%s">' % words(rng, 25),
+            '<meta property="og:url" content="%s">' % url,
+            '<meta property="og:image" content="http://img.example.com/og.jpg">',
+            '<meta name="twitter:card" content="summary_large_image">',
+            '<meta name="twitter:title" content="%s">' % words(rng, 6),
+            '<meta name="twitter:image" content="http://img.example.com/twitter.jpg">',
+            '<link rel="canonical" href="%s">' % url,
+            '<link rel="alternate" type="application/rss+xml" href="/feed.xml">']
+    for i in range(count):
+        tags.append('<meta name="custom:%d" content="%s">' % (i, words(rng, 10)))
+        tags.append('<meta property="article:tag" content="%s">' % words(rng, 2))
+    return "\n".join(tags)
+
+
+def scripts(rng, count):
+    return "\n".join("<script>var data%d = %s;</script>" % (i, [rng.randint(0, 1000) for _ in range(50)])
+                     for i in range(count))
+
+
+def page(rng, kind, index, scale=1):
+    "Return the HTML of one page of the given kind."
+    url = "http://www.example.com/%s/%d" % (kind, index)
+    title = "<title>%s</title>" % words(rng, 8)
+    if kind == "article":
+        head = title + meta_tags(rng, 2, url)
+        body = nested("<article><h1>%s</h1>%s</article>" % (words(rng, 8), paragraphs(rng, 120 * scale)), 60)
+    elif kind == "gallery":
+        head = title + meta_tags(rng, 2, url)
+        body = nested("<h1>%s</h1>%s" % (words(rng, 5), images(rng, 300 * scale)), 20, tag="section")
+    elif kind == "meta":
+        head = title + meta_tags(rng, 150 * scale, url)
+        body = "<h1>%s</h1>%s" % (words(rng, 5), paragraphs(rng, 5 * scale))
+    else:
+        head = title + meta_tags(rng, 20, url) + "<style>%s</style>" % ("p { margin: 0 } " * 200) + scripts(rng, 5)
+        nav = "<nav><ul>%s</ul></nav>" % "".join('<li><a href="/s/%d">%s</a></li>' % (i, words(rng, 2))
+                                                  for i in range(80))
+        body = nav + nested("<article><h2>%s</h2>%s%s</article>" % (words(rng, 6), paragraphs(rng, 30 * scale),
+                                                                    images(rng, 40 * scale)), 30)
+        body += scripts(rng, 10 * scale)
+    return url, "<!DOCTYPE html>\n<html><head>%s</head><body>%s</body></html>" % (head, body)
+
+
+def generate(count=40, seed=0, scale=1, kinds=KINDS):
+    """
+    Return a list of `count` (html, source_url) pairs, cycling through `kinds`.
+
+    `scale` multiplies the size of each page's body.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        url, html = page(rng, kinds[index % len(kinds)], index, scale=scale)
+        corpus.append((html, url))
+    return corpus
@@ -0,0 +1,39 @@
+"""
+Benchmark merging and deduplicating large numbers of candidates.
+
+Run with::
+
+    python -m extraction.benchmarks.dedup
+
+Each technique returns `n` candidate images, half of which duplicate
+each other, and half of which duplicate the previous technique's.
+The time per candidate should stay flat as `n` grows.
+"""
+import sys
+import timeit
+
+from extraction import DictExtractor
+from extraction.techniques import Technique
+
+
+class CandidatesTechnique(Technique):
+    "Returns a fixed list of candidates, set on each instance by the benchmark."
+    candidates = []
+
+    def extract(self, html):
+        return {'images': self.candidates, 'titles': self.candidates}
+
+
+def run(sizes=(100, 1000, 10000, 100000), repeat=3):
+    "Print the time per candidate for each number of candidates in sizes."
+    extractor = DictExtractor(techniques=["extraction.benchmarks.dedup.CandidatesTechnique"] * 2)
+    for n in sizes:
+        candidates = ["http://example.com/%s.png" % (i // 2) for i in range(n)]
+        for _, technique in extractor._resolved.techniques:
+            technique.candidates = candidates
+        seconds = min(timeit.repeat(lambda: extractor.run_techniques(""), number=1, repeat=repeat))
+        sys.stdout.write("%8d candidates: %8.3f ms, %6.3f us/candidate\n" % (n, seconds * 1000, seconds * 1e6 / n))
+
+
+if __name__ == '__main__':
+    run()
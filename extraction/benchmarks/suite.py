@@ -0,0 +1,196 @@
+"""
+Benchmark extraction throughput, latency and memory over a generated corpus.
+
+Run with::
+
+    python -m extraction.benchmarks.suite --output results.json
+    python -m extraction.benchmarks.suite --compare results.json
+
+Each installed parser backend is benchmarked with each default
+technique on its own, and with all of them together, extracting every
+page of a corpus from ``extraction.benchmarks.corpus``. Results are
+written as JSON with, for each backend and technique, the pages per
+second, the p50 and p99 latency of a page, and the peak resident
+memory of the process which ran it. Each measurement runs in a fresh
+process so peak memory isn't inherited from earlier measurements.
+
+Given ``--compare``, results are checked against an earlier run and
+the command exits with status 1 if any got slower than ``--tolerance``
+allows, which makes it easy to catch regressions between releases.
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import platform
+import sys
+import time
+
+from extraction import DictExtractor
+from extraction.benchmarks import corpus
+from extraction.parsers import get_parser
+
+
+PARSERS = ("html5lib", "lxml", "html.parser", "selectolax")
+
+# name given to the measurement which runs all of the techniques together
+ALL_TECHNIQUES = "all"
+
+
+def percentile(values, fraction):
+    "Return the nearest-rank percentile of sorted values."
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def peak_rss():
+    "Return the peak resident memory of this process in bytes, or None if it's unknown."
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS, and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(parser, technique, pages=40, seed=0, scale=1):
+    "Extract a generated corpus with one parser and technique, returning the measurements."
+    documents = corpus.generate(pages, seed=seed, scale=scale)
+    techniques = None if technique == ALL_TECHNIQUES else [technique]
+    extractor = DictExtractor(techniques=techniques, parser=parser)
+
+    # warm up imports and caches before timing anything
+    extractor.extract(*documents[0])
+    latencies = []
+    start = time.perf_counter()
+    for html, source_url in documents:
+        page_start = time.perf_counter()
+        extractor.extract(html, source_url=source_url)
+        latencies.append(time.perf_counter() - page_start)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    return {
+        'parser': parser,
+        'technique': technique,
+        'pages': len(documents),
+        'bytes': sum(len(html.encode('utf-8')) for html, _ in documents),
+        'seconds': elapsed,
+        'pages_per_second': len(documents) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_rss_bytes': peak_rss(),
+    }
+
+
+def run(parsers=PARSERS, techniques=None, pages=40, seed=0, scale=1, isolate=True):
+    """
+    Benchmark each installed parser in `parsers` with each of `techniques`.
+
+    `techniques` defaults to each of the default techniques on its own
+    followed by all of them together. Parsers which aren't installed are
+    listed under ``skipped``. If `isolate` is True each measurement runs
+    in a freshly started process.
+    """
+    if techniques is None:
+        techniques = list(DictExtractor.techniques) + [ALL_TECHNIQUES]
+
+    results, skipped = [], []
+    for parser in parsers:
+        try:
+            get_parser(parser)
+        except ImportError:
+            skipped.append(parser)
+            continue
+        for technique in techniques:
+            if isolate:
+                context = multiprocessing.get_context("spawn")
+                with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(measure, parser, technique, pages, seed, scale).result()
+            else:
+                result = measure(parser, technique, pages, seed, scale)
+            results.append(result)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.time(),
+        'corpus': {'pages': pages, 'seed': seed, 'scale': scale},
+        'skipped': skipped,
+        'results': results,
+    }
+
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Return a list of regressions in `current` results relative to `baseline`.
+
+    A measurement regresses if its throughput dropped, or its p99 latency
+    rose, by more than `tolerance` as a fraction of the baseline. Each
+    regression is a dictionary naming the parser, technique and metric
+    along with its baseline and current values.
+    """
+    previous = dict(((x['parser'], x['technique']), x) for x in baseline['results'])
+    regressions = []
+    for result in current['results']:
+        before = previous.get((result['parser'], result['technique']))
+        if before is None:
+            continue
+        checks = (('pages_per_second', result['pages_per_second'] < before['pages_per_second'] * (1 - tolerance)),
+                  ('p99_ms', result['p99_ms'] > before['p99_ms'] * (1 + tolerance)))
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append({'parser': result['parser'], 'technique': result['technique'],
+                                    'metric': metric, 'baseline': before[metric], 'current': result[metric]})
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m extraction.benchmarks.suite",
+                                     description="Benchmark extraction over a generated corpus, writing JSON.")
+    parser.add_argument("--parser", action="append", dest="parsers",
+                        help="parser backend to benchmark, may be repeated (default: all installed)")
+    parser.add_argument("-t", "--technique", action="append", dest="techniques",
+                        help="technique to benchmark, or %r, may be repeated "
+                        "(default: each default technique and all)" % ALL_TECHNIQUES)
+    parser.add_argument("--pages", type=int, default=40, help="pages in the corpus")
+    parser.add_argument("--seed", type=int, default=0, help="seed for generating the corpus")
+    parser.add_argument("--scale", type=int, default=1, help="multiplier for the size of each page")
+    parser.add_argument("--no-isolate", dest="isolate", action="store_false",
+                        help="run every measurement in this process, so peak memory accumulates")
+    parser.add_argument("--output", help="file to write results to (default: stdout)")
+    parser.add_argument("--compare", help="results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="fraction by which results may be worse than --compare before failing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, stdout=None, stderr=None):
+    "Run the benchmarks, returning 1 if there were regressions."
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    args = parse_args(argv)
+    results = run(parsers=args.parsers or PARSERS, techniques=args.techniques, pages=args.pages,
+                  seed=args.seed, scale=args.scale, isolate=args.isolate)
+
+    output = json.dumps(results, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, 'w') as fout:
+            fout.write(output)
+    else:
+        stdout.write(output)
+
+    if args.compare:
+        with open(args.compare) as fin:
+            regressions = compare(json.load(fin), results, tolerance=args.tolerance)
+        for regression in regressions:
+            stderr.write("regression: %(parser)s %(technique)s %(metric)s %(baseline).3f -> %(current).3f\n"
+                         % regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
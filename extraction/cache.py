@@ -0,0 +1,178 @@
+"""
+Caches for extraction results, keyed by a hash of the document.
+
+    >>> from extraction.cache import LRUCache
+    >>> extractor = Extractor(cache=LRUCache(maxsize=10000, ttl=3600))
+    >>> extractor.extract(html).title
+    >>> extractor.extract(html).title  # served from the cache
+    >>> extractor.cache.hits, extractor.cache.misses
+    (1, 1)
+
+``SqliteCache`` keeps results on disk so they survive restarts. Other
+backends can be added by subclassing ``Cache`` and implementing
+``load`` and ``store``. Caches can be shared between threads, so
+backends hold ``lock`` while reading or writing their storage.
+"""
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def cache_key(html, source_url, config):
+    """
+    Return a key identifying `html` extracted with a given configuration.
+
+    `html`, which may be a string or bytes, is hashed with BLAKE2b
+    along with the `source_url` and `config`, a tuple describing
+    everything else which affects the results, such as the techniques
+    and strict_types.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(html, str):
+        html = html.encode('utf-8', 'surrogatepass')
+    digest.update(html)
+    digest.update(repr((source_url, config)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class Cache(object):
+    "Base class for caches, which counts hits and misses."
+
+    def __init__(self, ttl=None):
+        "`ttl` is the number of seconds results are kept, or None to keep them forever."
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        "Locks can't be pickled, so each unpickled cache gets its own."
+        state = self.__dict__.copy()
+        state['lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def expires(self):
+        "Return the time at which a result stored now expires."
+        if self.ttl is None:
+            return None
+        return time.time() + self.ttl
+
+    def get(self, key):
+        "Return the cached result for key, or None."
+        value = self.load(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        "Cache the result for key."
+        self.store(key, value)
+
+    def load(self, key):
+        "Return the stored value for key if it exists and hasn't expired."
+        raise NotImplementedError()
+
+    def store(self, key, value):
+        "Store value for key."
+        raise NotImplementedError()
+
+
+class LRUCache(Cache):
+    "In-memory cache which evicts the least recently used results."
+
+    def __init__(self, maxsize=1024, ttl=None):
+        "Keep at most `maxsize` results, each for at most `ttl` seconds."
+        super(LRUCache, self).__init__(ttl=ttl)
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def store(self, key, value):
+        expires = self.expires()
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+class SqliteCache(Cache):
+    """
+    On-disk cache stored in a SQLite database.
+
+    Results are stored as JSON, and results which can't be encoded
+    as JSON (for example from custom techniques) aren't cached.
+    """
+    def __init__(self, path, ttl=None):
+        "Store results in the SQLite database at `path`."
+        super(SqliteCache, self).__init__(ttl=ttl)
+        self.path = path
+        self._connection = None
+
+    def __getstate__(self):
+        "Connections can't be pickled, so reconnect when unpickled."
+        state = super(SqliteCache, self).__getstate__()
+        state['_connection'] = None
+        return state
+
+    @property
+    def connection(self):
+        "Connection to the database, creating its table on first use."
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS extracted "
+                                     "(key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+        return self._connection
+
+    def load(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT value, expires FROM extracted WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires = row
+            if expires is not None and expires < time.time():
+                with self.connection:
+                    self.connection.execute("DELETE FROM extracted WHERE key = ?", (key,))
+                return None
+        return json.loads(value)
+
+    def store(self, key, value):
+        try:
+            value = json.dumps(value)
+        except (TypeError, ValueError):
+            return
+        with self.lock:
+            with self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO extracted (key, value, expires) VALUES (?, ?, ?)",
+                                        (key, value, self.expires()))
+
+    def close(self):
+        "Close the connection to the database."
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,245 @@
+"""
+Command line bulk extractor, which writes one JSON object per page.
+
+    $ extraction pages/ crawl.warc archive.tar.gz > extracted.jsonl
+    $ cat pages.jsonl | extraction --workers 8 -t extraction.techniques.HeadTags
+
+Inputs are HTML files, directories of them, tarballs, uncompressed WARC
+archives or, given ``-`` or no paths at all, JSON lines on stdin with
+``html`` and optionally ``url`` and ``id`` keys. Each output line has
+the page's ``id``, its ``source_url`` and the ``extracted`` data, or
+an ``error`` for a file, record or JSON line which couldn't be read,
+or a page which failed, which doesn't stop the others. Throughput is
+reported on stderr.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import tarfile
+import time
+
+from extraction import DictExtractor, archive
+
+
+TARBALL_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz")
+WARC_SUFFIXES = (".warc",)
+
+
+def parse_page(line, number):
+    "Return (id, html, source_url, content_type) for a JSON line, raising ValueError if it isn't a page."
+    page = json.loads(line)
+    if not isinstance(page, dict) or not isinstance(page.get("html"), str):
+        raise ValueError("line %d has no html" % number)
+    return page.get("id", number), page["html"], page.get("url", page.get("source_url")), None
+
+
+def describe_error(error):
+    "Return the type and message of an exception, as written in the ``error`` of a page."
+    return "%s: %s" % (type(error).__name__, error)
+
+
+def read_jsonl(lines, errors=None):
+    """
+    Yield (id, html, source_url, content_type) for each JSON object in lines.
+
+    Malformed lines raise ``ValueError``, unless `errors` is given, in
+    which case it is called with the line's id (or number) and the
+    exception instead, and the line is skipped.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            page = parse_page(line, number)
+        except ValueError as e:
+            if errors is None:
+                raise
+            errors(number, e)
+            continue
+        yield page
+
+
+def read_tarball(path):
+    "Yield (id, html, source_url, content_type) for each file in a tarball."
+    with tarfile.open(path) as tarball:
+        for member in tarball:
+            if member.isfile():
+                yield "%s:%s" % (path, member.name), tarball.extractfile(member).read(), None, None
+
+
+def read_warc(path, errors=None):
+    """
+    Yield (id, html, source_url, content_type) for each HTML page in a WARC archive.
+
+    `errors` is passed on to ``archive.iter_pages``.
+    """
+    for record_id, source_url, html, content_type in archive.iter_pages(path, errors=errors):
+        # copied, as the mapped slice is released before workers see it
+        yield record_id, bytes(html), source_url, content_type
+
+
+def read_file(path):
+    "Yield (id, html, source_url, content_type) for a single HTML file."
+    with open(path, 'rb') as fin:
+        yield path, fin.read(), None, None
+
+
+def read_path(path, errors=None):
+    """
+    Yield (id, html, source_url, content_type) for each page in a file, directory, tarball or archive.
+
+    Files which can't be read raise, unless `errors` is given, in which
+    case it is called with the path (or record id) and the exception
+    instead, and reading carries on with the next file.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                for page in read_path(os.path.join(root, name), errors=errors):
+                    yield page
+        return
+    if path.endswith(TARBALL_SUFFIXES):
+        pages = read_tarball(path)
+    elif path.endswith(WARC_SUFFIXES):
+        pages = read_warc(path, errors=errors)
+    else:
+        pages = read_file(path)
+    try:
+        for page in pages:
+            yield page
+    except (OSError, tarfile.TarError) as e:
+        if errors is None:
+            raise
+        errors(path, e)
+
+
+def read_pages(paths, stdin, errors=None):
+    """
+    Yield (id, html, source_url, content_type) for every page in paths, reading stdin for '-'.
+
+    `errors` is passed on to ``read_jsonl`` and ``read_path``.
+    """
+    for path in paths or ["-"]:
+        if path == "-":
+            pages = read_jsonl(stdin, errors=errors)
+        else:
+            pages = read_path(path, errors=errors)
+        for page in pages:
+            yield page
+
+
+class Progress(object):
+    "Reports pages extracted and throughput every `interval` seconds."
+
+    def __init__(self, stream, interval=5.0):
+        self.stream = stream
+        self.interval = interval
+        self.count = 0
+        self.failed = 0
+        self.start = self.last_report = time.time()
+
+    def update(self, failed=False):
+        self.count += 1
+        self.failed += failed
+        now = time.time()
+        if self.interval and now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(now)
+
+    def report(self, now=None):
+        elapsed = (now or time.time()) - self.start
+        rate = self.count / elapsed if elapsed else 0.0
+        failed = ", %d failed" % self.failed if self.failed else ""
+        self.stream.write("extracted %d pages in %.1fs, %.1f pages/sec%s\n" % (self.count, elapsed, rate, failed))
+        self.stream.flush()
+
+
+def add_extractor_arguments(parser):
+    "Add the options which configure an extractor to an argument parser."
+    parser.add_argument("-t", "--technique", action="append", dest="techniques",
+                        help="technique to run, may be repeated (default: the standard techniques)")
+    parser.add_argument("--parser", default=None, help="parser backend, e.g. lxml or selectolax")
+    parser.add_argument("--streaming", action="store_true", help="only parse page heads when possible")
+    parser.add_argument("--scan", action="store_true",
+                        help="scan for title, meta and link tags rather than parsing when possible")
+    parser.add_argument("--strict-types", action="store_true", help="only output standard data types")
+    parser.add_argument("--max-description-length", type=int, default=None,
+                        help="cut descriptions to at most this many characters")
+
+
+def extractor_options(args):
+    "Return the keyword arguments for an extractor configured by parsed arguments."
+    return dict(techniques=args.techniques, strict_types=args.strict_types, parser=args.parser,
+                streaming=args.streaming, scan=args.scan, max_description_length=args.max_description_length)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="extraction", description="Extract titles, descriptions, images "
+                                     "and more from HTML pages, writing JSON lines to stdout.")
+    parser.add_argument("paths", nargs="*", help="HTML files, directories, tarballs or WARC archives, "
+                        "or - for JSON lines on stdin (the default)")
+    add_extractor_arguments(parser)
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes, 0 to extract in this process (default: one per CPU)")
+    parser.add_argument("--chunksize", type=int, default=16, help="pages sent to a worker at a time")
+    parser.add_argument("--progress", type=float, default=5.0,
+                        help="seconds between throughput reports on stderr, 0 to disable")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    """
+    Run the command line extractor.
+
+    Returns 1 if any page couldn't be read or extracted, otherwise 0.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    args = parse_args(argv)
+    extractor = DictExtractor(**extractor_options(args))
+
+    # results come back in order, so ids are matched up first in, first
+    # out, along with the error for pages which were never extracted
+    ids = collections.deque()
+
+    def read_error(page_id, error):
+        ids.append((page_id, None, error))
+
+    def documents():
+        for page_id, html, source_url, content_type in read_pages(args.paths, stdin, errors=read_error):
+            ids.append((page_id, source_url, None))
+            yield html, source_url, content_type
+
+    progress = Progress(stderr, interval=args.progress)
+
+    def write(page_id, source_url, extracted):
+        if isinstance(extracted, Exception):
+            error = describe_error(extracted)
+            stdout.write(json.dumps({"id": page_id, "source_url": source_url, "error": error}) + "\n")
+            stderr.write("failed to extract %s: %s\n" % (page_id, error))
+            progress.update(failed=True)
+        else:
+            stdout.write(json.dumps({"id": page_id, "source_url": source_url, "extracted": extracted}) + "\n")
+            progress.update()
+
+    results = extractor.extract_many(documents(), workers=args.workers, chunksize=args.chunksize,
+                                     return_exceptions=True)
+    for extracted in results:
+        while ids[0][2] is not None:
+            write(*ids.popleft())
+        page_id, source_url, _ = ids.popleft()
+        write(page_id, source_url, extracted)
+    while ids:
+        write(*ids.popleft())
+    if args.progress:
+        progress.report()
+    return 1 if progress.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
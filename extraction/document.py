@@ -0,0 +1,117 @@
+"""
+Shared representation of an HTML document being extracted.
+
+A ``Document`` is a string of HTML which also carries the parsed
+tree for that HTML, so that every technique run against it by an
+``Extractor`` shares a single parse::
+
+    >>> from extraction.document import Document
+    >>> doc = Document("<title>Hi</title>")
+    >>> doc.soup is doc.soup
+    True
+
+Because ``Document`` subclasses ``str``, techniques which parse
+the raw HTML themselves keep working unchanged.
+
+A head-only ``Document`` only parses the portion of the page before
+the body begins, which is all head-only techniques need.
+
+Techniques declare the tags they are interested in, and the
+``Document`` collects all of those tags in a single walk of the
+tree, rather than each technique searching the tree on its own::
+
+    >>> doc = Document(html, tags=["meta", "title"])
+    >>> doc.elements("meta")
+    [<meta ...>, ...]
+
+A scanning ``Document`` whose tags are all title, meta and link tags
+finds them with ``extraction.scanner`` rather than parsing at all,
+unless the scanner isn't sure of the results.
+
+Declarative techniques are resolved together, once per document, by
+the ``SelectorIndex`` the document is created with (see
+``extraction.selectors``).
+"""
+import time
+
+from extraction.parsers import DEFAULT_PARSER, get_parser
+from extraction.scanner import SCANNABLE_TAGS, scan
+from extraction.stream import find_head_end
+
+
+class Document(str):
+    "HTML string which parses itself at most once."
+
+    def __new__(cls, html="", parse=None, head_only=False, tags=(), fields=None, selectors=None, scan=False):
+        """
+        Create a Document from a string of HTML.
+
+        `parse` is a function from ``extraction.parsers`` used to build
+        the tree, defaulting to the html5lib backend. If `head_only` is
+        True then tokenizing stops where the head ends, and only that
+        prefix of the page is parsed.
+
+        `tags` are the names of tags to gather in one pass over the
+        tree the first time ``elements`` is called.
+
+        `fields` is the set of data types requested from this document,
+        or None if every data type is wanted.
+
+        `selectors` is the ``SelectorIndex`` of the extractor's
+        declarative techniques, if any.
+
+        If `scan` is True, and `tags` are all title, meta or link tags,
+        ``elements`` tries scanning for them before parsing.
+        """
+        doc = super(Document, cls).__new__(cls, html or "")
+        doc.parse = parse
+        doc.head_only = head_only
+        doc.tags = frozenset(tags)
+        doc.fields = fields
+        doc.selectors = selectors
+        doc.scan = scan
+        doc._soup = None
+        doc._elements = None
+        doc._selected = {}
+        doc.parse_seconds = 0.0
+        return doc
+
+    @property
+    def soup(self):
+        "Return the parsed tree for this document, parsing it on first access."
+        if self._soup is None:
+            start = time.perf_counter()
+            parse = self.parse or get_parser(DEFAULT_PARSER)
+            if self.head_only:
+                self._soup = parse(self[:find_head_end(self)])
+            else:
+                self._soup = parse(self)
+            self.parse_seconds += time.perf_counter() - start
+        return self._soup
+
+    def elements(self, name):
+        """
+        Return all elements named `name` in document order.
+
+        The first call walks the tree once, routing every element
+        whose name is in `tags` into its own list, or scans for them
+        instead if possible. Names which weren't registered in `tags`
+        fall back to searching the tree.
+        """
+        if self._elements is None and self.scan and self.tags and self.tags <= SCANNABLE_TAGS:
+            self._elements = scan(self[:find_head_end(self)] if self.head_only else self, self.tags)
+        if self._elements is None:
+            self._elements = dict((x, []) for x in self.tags)
+            if self.tags:
+                for element in self.soup.find_all(list(self.tags)):
+                    self._elements[element.name].append(element)
+        if name not in self._elements:
+            self._elements[name] = self.soup.find_all(name)
+        return self._elements[name]
+
+    def selected(self, index):
+        "Return the values a ``SelectorIndex`` selects from this document, selecting them once."
+        selected = self._selected.get(index)
+        if selected is None:
+            selected = self._selected[index] = index.select(self)
+        return selected
@@ -0,0 +1,121 @@
+"""
+Decoding raw bytes of HTML documents.
+
+Extractors accept ``bytes`` (or any bytes-like object, such as a
+``memoryview``) as well as strings. The charset is sniffed from, in
+order of precedence, a byte order mark, the charset parameter of an
+HTTP Content-Type header, and a ``<meta charset>`` declaration within
+the first few KB of the document::
+
+    >>> from extraction.encoding import decode
+    >>> decode(b'<meta charset="latin-1"><title>Caf\\xe9</title>')
+    '<meta charset="latin-1"><title>Café</title>'
+
+Documents without any charset information are decoded as UTF-8,
+falling back to windows-1252 if they aren't valid UTF-8.
+"""
+import codecs
+import re
+
+from extraction.stream import read_head
+
+
+# number of bytes searched for a <meta charset> declaration
+SNIFF_BYTES = 4096
+
+# charsets tried, in order, for documents which don't declare one
+FALLBACK_CHARSETS = ('utf-8', 'windows-1252')
+
+BOMS = ((codecs.BOM_UTF8, 'utf-8'),
+        (codecs.BOM_UTF32_LE, 'utf-32-le'),
+        (codecs.BOM_UTF32_BE, 'utf-32-be'),
+        (codecs.BOM_UTF16_LE, 'utf-16-le'),
+        (codecs.BOM_UTF16_BE, 'utf-16-be'))
+
+# text codecs which can't decode arbitrary documents, where UTF-32 is
+# still used when a document starts with its byte order mark
+UNDECODABLE_CHARSETS = frozenset(['idna', 'punycode', 'undefined', 'utf-32'])
+
+# codecs which need a byte order mark, for the byte order the HTML5
+# encoding standard assumes when there isn't one
+BYTE_ORDERS = {'utf-16': 'utf-16-le'}
+
+META_CHARSET_RE = re.compile(br"""<meta[^>]+?charset\s*=\s*["']?\s*([a-zA-Z0-9_:.-]+)""", re.IGNORECASE)
+HEADER_CHARSET_RE = re.compile(r"""charset\s*=\s*["']?([^\s;"']+)""", re.IGNORECASE)
+
+
+def normalize_charset(charset):
+    """
+    Return the canonical codec name for a charset, or None if it's unknown.
+
+    Charsets come from untrusted documents and headers, so codecs which
+    don't decode bytes into text, such as ``hex`` or ``zlib``, are
+    treated as unknown, as are those in ``UNDECODABLE_CHARSETS``.
+    Documents with a byte order mark never get this far, so UTF-16
+    is taken to be little-endian.
+    """
+    try:
+        codec = codecs.lookup(charset)
+    except (LookupError, TypeError):
+        return None
+    if not getattr(codec, '_is_text_encoding', True) or codec.name in UNDECODABLE_CHARSETS:
+        return None
+    return BYTE_ORDERS.get(codec.name, codec.name)
+
+
+def sniff_charset(data, content_type=None):
+    """
+    Return (charset, bom_length) for the bytes of an HTML document.
+
+    `content_type` is the value of an HTTP Content-Type header, if known.
+    The charset is None if the document gives no indication of one.
+    """
+    for bom, charset in BOMS:
+        if data[:len(bom)] == bom:
+            return charset, len(bom)
+
+    if content_type:
+        match = HEADER_CHARSET_RE.search(content_type)
+        charset = match and normalize_charset(match.group(1))
+        if charset:
+            return charset, 0
+
+    match = META_CHARSET_RE.search(data[:SNIFF_BYTES])
+    charset = match and normalize_charset(match.group(1).decode('ascii'))
+    if charset:
+        # as per HTML5, a document which was readable as ASCII can't
+        # really be UTF-16, which is a common mislabeling
+        if charset.startswith('utf-16'):
+            charset = 'utf-8'
+        return charset, 0
+    return None, 0
+
+
+def decode_chunks(data, charset, errors='strict', chunk_size=4096):
+    "Incrementally decode bytes-like data, yielding `chunk_size` bytes at a time."
+    decoder = codecs.getincrementaldecoder(charset)(errors=errors)
+    for start in range(0, len(data), chunk_size):
+        yield decoder.decode(data[start:start + chunk_size])
+    yield decoder.decode(b"", final=True)
+
+
+def decode(data, content_type=None, head_only=False):
+    """
+    Decode the bytes of an HTML document into a string.
+
+    `data` is read through a ``memoryview``, so slices of it are never
+    copied. If `head_only` is True, bytes are only decoded until the
+    tokenizer finds the end of the head, and the body is never decoded.
+    """
+    data = memoryview(data)
+    charset, bom_length = sniff_charset(data, content_type)
+    data = data[bom_length:]
+    charsets = (charset,) if charset else FALLBACK_CHARSETS
+    for charset in charsets:
+        errors = 'replace' if charset == charsets[-1] else 'strict'
+        try:
+            if head_only:
+                return read_head(decode_chunks(data, charset, errors))
+            return str(data, charset, errors)
+        except UnicodeDecodeError:
+            continue
@@ -0,0 +1,296 @@
+"""
+Incremental re-extraction of pages which have changed since they were last extracted.
+
+Re-crawled pages usually differ from the previous crawl in a comment
+count or an ad slot, leaving most of what techniques look at alone.
+Extracting a page incrementally returns a ``Fingerprint`` along with
+the results, which is passed back in the next time the page is seen::
+
+    >>> extracted, fingerprint = extractor.extract_incremental(html, source_url=url)
+    >>> extracted, fingerprint = extractor.extract_incremental(new_html, fingerprint, source_url=url)
+
+A page is split into regions, its head and each block of its body, and
+the fingerprint holds a hash of each region along with the names of
+the tags within it, and of the elements it is nested within. Only
+techniques searching for tags found in a changed region (before or
+after the change) are run again, and the other techniques' earlier
+results are reused. Techniques which don't declare their ``tags`` are
+run again whenever anything changed.
+
+Regions are found by tokenizing rather than parsing, so for misnested
+markup, which parsers repair by moving, closing or creating elements,
+they may not match the parsed tree. Such regions are marked uncertain,
+and every technique is run again whenever a page with an uncertain
+region changes.
+"""
+import difflib
+import hashlib
+import html.parser
+
+from extraction.encoding import decode
+from extraction.limits import exceeds_bytes
+from extraction.stream import find_head_end
+
+
+# tags which never have content, so never contain the tags after them
+VOID_TAGS = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+                       "meta", "param", "source", "track", "wbr"])
+
+# returned by changed_tags when any tag could have been affected by a change
+ALL_TAGS = object()
+
+# tags which wrap the whole body rather than being blocks within it
+DOCUMENT_TAGS = frozenset(["html", "head", "body"])
+
+# elements nested within fewer than this many others start blocks, so
+# pages wrapped in a container or two are still split up
+BLOCK_DEPTH = 4
+
+HEADING_TAGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+
+# start tags which close an open p element, per the HTML5 tree construction rules
+CLOSES_P_TAGS = frozenset(["address", "article", "aside", "blockquote", "center", "details", "dialog", "dir",
+                           "div", "dl", "fieldset", "figcaption", "figure", "footer", "form", "header", "hgroup",
+                           "hr", "listing", "main", "menu", "nav", "ol", "p", "plaintext", "pre", "search",
+                           "section", "summary", "table", "ul", "xmp", "li", "dd", "dt"]) | HEADING_TAGS
+
+# groups of elements which close an open element of the same group, rather than nesting within it
+IMPLICITLY_CLOSED_GROUPS = [frozenset(["li"]), frozenset(["dd", "dt"]), frozenset(["a"]), frozenset(["nobr"]),
+                            frozenset(["button"]), frozenset(["form"]), frozenset(["select", "input", "textarea"]),
+                            frozenset(["option", "optgroup"]), frozenset(["rb", "rp", "rt", "rtc"]),
+                            frozenset(["caption", "colgroup", "tbody", "td", "tfoot", "th", "thead", "tr"])]
+
+# elements whose contents parsers may move out of or into them, unlike the
+# tokenizer, which only ever sees more tags than parsers within others
+UNCERTAIN_TAGS = frozenset(["math", "svg", "template"])
+
+# elements whose contents parsers read as text, so that leaving one
+# unclosed turns the rest of the page into text
+TEXT_TAGS = frozenset(["iframe", "noembed", "noframes", "plaintext", "textarea", "title", "xmp"])
+
+# elements parsers keep within a select, dropping any others
+SELECT_TAGS = frozenset(["hr", "optgroup", "option", "script", "template"])
+
+# markup which the tokenizer reads differently from parsers
+UNCERTAIN_MARKUP = ("<!-->", "<!--->", "--!>", "<![")
+
+
+class BlockTokenizer(html.parser.HTMLParser):
+    """
+    Tokenizer which records where each block of a body starts.
+
+    Blocks start with each element nested within fewer than `depth`
+    others. The tags of each block include those of the elements it
+    is nested within, as techniques may search for those and then look
+    at their contents.
+
+    Open elements are tracked from start and end tags alone, which
+    only matches the parsed tree for well nested markup. `uncertain`
+    is set once the tokenizer sees an end tag which doesn't close the
+    innermost open element, a start tag which parsers would take to
+    close an open element, or anything else parsers may read differently.
+    Elements which are never closed merge the blocks after them into
+    theirs, which only makes changes look bigger than they are.
+    """
+    def __init__(self, depth=BLOCK_DEPTH):
+        html.parser.HTMLParser.__init__(self, convert_charrefs=False)
+        self.depth = depth
+        self.open = []
+        self.starts = []
+        self.tags = []
+        self.uncertain = False
+        self.text_tag = None
+
+    def feed(self, data):
+        if any(x in data for x in UNCERTAIN_MARKUP):
+            self.uncertain = True
+        html.parser.HTMLParser.feed(self, data)
+
+    def closes_implicitly(self, tag):
+        "Return True if parsers would take a start `tag` to close an open element, or drop it."
+        if tag in CLOSES_P_TAGS and "p" in self.open:
+            return True
+        if tag in HEADING_TAGS and self.open and self.open[-1] in HEADING_TAGS:
+            return True
+        if "select" in self.open and tag not in SELECT_TAGS:
+            return True
+        return any(tag in group and not group.isdisjoint(self.open) for group in IMPLICITLY_CLOSED_GROUPS)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DOCUMENT_TAGS:
+            return
+        if tag == "image":
+            # parsers build img elements from image tags
+            tag = "img"
+        if tag in UNCERTAIN_TAGS or self.text_tag or self.closes_implicitly(tag):
+            self.uncertain = True
+        if tag in TEXT_TAGS:
+            self.text_tag = tag
+        if len(self.open) < self.depth or not self.tags:
+            self.starts.append(self.getpos())
+            self.tags.append(set(self.open))
+        self.tags[-1].add(tag)
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # parsers ignore the slash in <div/>, so only void tags are closed
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in DOCUMENT_TAGS:
+            return
+        if not self.open or self.open[-1] != tag:
+            self.uncertain = True
+        if tag == self.text_tag:
+            self.text_tag = None
+        if tag in self.open:
+            while self.open.pop() != tag:
+                pass
+
+    def close(self):
+        html.parser.HTMLParser.close(self)
+        if self.text_tag is not None:
+            self.uncertain = True
+
+    def handle_data(self, data):
+        # parsers may read on past the end of scripts holding comments
+        if self.cdata_elem == "script" and "<!--" in data:
+            self.uncertain = True
+
+
+def region_hash(text):
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
+
+
+def regions(text):
+    """
+    Return a list of (hash, tags) for the regions of an HTML document.
+
+    The first region is the head, and each following region is a
+    block of the body, running until the next one starts. If the
+    structure of the head or body is uncertain, its tags are None,
+    and the body is a single region.
+    """
+    head_end = find_head_end(text)
+    head = text[:head_end]
+    tokenizer = BlockTokenizer()
+    tokenizer.feed(head)
+    tokenizer.close()
+    found = [(region_hash(head), None if tokenizer.uncertain else frozenset().union(*tokenizer.tags))]
+
+    body = text[head_end:]
+    tokenizer = BlockTokenizer()
+    tokenizer.feed(body)
+    tokenizer.close()
+    if tokenizer.uncertain:
+        found.append((region_hash(body), None))
+        return found
+
+    line_starts = [0]
+    position = body.find("\n")
+    while position != -1:
+        line_starts.append(position + 1)
+        position = body.find("\n", position + 1)
+    offsets = [line_starts[lineno - 1] + column for lineno, column in tokenizer.starts]
+
+    # anything before the first block, such as text, starts the first block
+    if offsets:
+        offsets[0] = 0
+    for index, start in enumerate(offsets):
+        end = offsets[index + 1] if index + 1 < len(offsets) else len(body)
+        found.append((region_hash(body[start:end]), frozenset(tokenizer.tags[index])))
+    if not offsets and body:
+        found.append((region_hash(body), frozenset()))
+    return found
+
+
+def changed_tags(old_regions, new_regions):
+    """
+    Return the names of the tags in regions which differ between two lists of regions.
+
+    Returns None if nothing changed, and ``ALL_TAGS`` if anything
+    changed and either list has an uncertain region. Regions which
+    moved count as changed.
+    """
+    matcher = difflib.SequenceMatcher(None, [x[0] for x in old_regions], [x[0] for x in new_regions],
+                                      autojunk=False)
+    changed = None
+    for operation, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if operation != 'equal':
+            changed = changed or set()
+            for _, tags in old_regions[old_start:old_end] + new_regions[new_start:new_end]:
+                changed.update(tags or ())
+    if changed is not None and any(tags is None for _, tags in old_regions + new_regions):
+        return ALL_TAGS
+    return changed
+
+
+class Fingerprint(object):
+    """
+    What an incremental extraction needs to know about a page's previous version.
+
+    `regions` is the list of (hash, tags) from ``regions``, `results`
+    a dictionary of each technique's position in the extractor's
+    techniques to its cleaned-up results, and `config` identifies the
+    extractor and source URL, as results from any other can't be reused.
+    """
+    def __init__(self, regions, results, config):
+        self.regions = regions
+        self.results = results
+        self.config = config
+
+    def as_dict(self):
+        "Return the fingerprint as a dictionary, which can be encoded as JSON if the results can."
+        return {'regions': [[digest, None if tags is None else sorted(tags)] for digest, tags in self.regions],
+                'results': [[position, results] for position, results in sorted(self.results.items())],
+                'config': repr(self.config)}
+
+    @classmethod
+    def from_dict(cls, data):
+        "Return the fingerprint for a dictionary from ``as_dict``."
+        return cls([(digest, None if tags is None else frozenset(tags)) for digest, tags in data['regions']],
+                   dict((position, results) for position, results in data['results']),
+                   data['config'])
+
+    def matches(self, config):
+        return self.config == config or self.config == repr(config)
+
+
+def stale_techniques(techniques, changed):
+    "Return the positions of techniques which could be affected by changes to tags in `changed`."
+    if changed is ALL_TAGS:
+        return set(range(len(techniques)))
+    return set(position for position, (_, technique) in enumerate(techniques)
+               if not getattr(technique, 'tags', ()) or changed.intersection(technique.tags))
+
+
+def exceeds_limits(extractor, html):
+    "Return True if `html` will be truncated, which may change what every technique sees."
+    return ((extractor.max_bytes is not None and exceeds_bytes(html, extractor.max_bytes)) or
+            (extractor.max_nodes is not None and html.count("<") > extractor.max_nodes))
+
+
+def extract_incremental(extractor, html, fingerprint=None, source_url=None, content_type=None):
+    """
+    Extract `html`, reusing results from a previous version of the page where possible.
+
+    `fingerprint` is the ``Fingerprint`` returned when the previous
+    version was extracted, or None to extract everything. Returns the
+    extracted results and a new ``Fingerprint`` for this version.
+    """
+    if isinstance(html, (bytes, bytearray, memoryview)):
+        html = decode(html, content_type=content_type)
+    config = extractor.cache_config() + (source_url,)
+    new_regions = regions(html)
+
+    reuse = {}
+    if fingerprint is not None and fingerprint.matches(config) and not exceeds_limits(extractor, html):
+        changed = changed_tags(fingerprint.regions, new_regions)
+        stale = stale_techniques(extractor._resolved.techniques, changed) if changed is not None else set()
+        reuse = dict((position, results) for position, results in fingerprint.results.items()
+                     if position not in stale)
+
+    results = {}
+    extracted = extractor.run_techniques(html, source_url=source_url, reuse=reuse, results=results)
+    return extracted, Fingerprint(new_regions, results, config)
@@ -0,0 +1,107 @@
+"""
+Instrumentation for seeing where extraction time goes.
+
+Extractors given an `instrument` sink report measurements to it::
+
+    >>> from extraction.instrument import StatsSink
+    >>> stats = StatsSink()
+    >>> extractor = Extractor(instrument=stats)
+    >>> extractor.extract(html)
+    >>> stats.summary()[('technique_seconds', 'extraction.techniques.SemanticTags')]
+    {'count': 1, 'total': 0.0021, 'min': 0.0021, 'max': 0.0021, 'mean': 0.0021}
+
+The metrics reported for each document are:
+
+* ``document_bytes``: length of the document passed to ``extract``
+* ``parse_seconds``: time spent parsing the document into a tree
+* ``technique_seconds``: time spent in each technique's ``extract``,
+  excluding any parsing it triggered
+* ``cleanup_seconds``: time spent cleaning up each technique's results
+* ``candidates``: values each technique produced
+* ``kept``: values from each technique kept after removing duplicates
+
+Per-technique metrics are reported with the technique's path, the
+others with a technique of None. Without a sink, extractors skip all
+of this bookkeeping.
+"""
+import threading
+
+
+class Sink(object):
+    "Base class for receivers of instrumentation."
+
+    def record(self, metric, value, technique=None):
+        "Record one measurement of `metric`, optionally for a `technique`."
+        raise NotImplementedError()
+
+
+class CallbackSink(Sink):
+    "Passes each measurement to a callback as callback(metric, value, technique)."
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, metric, value, technique=None):
+        self.callback(metric, value, technique)
+
+
+class StatsSink(Sink):
+    "Aggregates count, total, min and max for each metric and technique."
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def record(self, metric, value, technique=None):
+        key = (metric, technique)
+        with self.lock:
+            stat = self.stats.get(key)
+            if stat is None:
+                self.stats[key] = [1, value, value, value]
+            else:
+                stat[0] += 1
+                stat[1] += value
+                if value < stat[2]:
+                    stat[2] = value
+                if value > stat[3]:
+                    stat[3] = value
+
+    def summary(self):
+        "Return a dictionary of statistics keyed by (metric, technique)."
+        with self.lock:
+            return dict((key, {'count': count, 'total': total, 'min': low, 'max': high, 'mean': total / count})
+                        for key, (count, total, low, high) in self.stats.items())
+
+
+class PrometheusSink(Sink):
+    """
+    Reports measurements to Prometheus-style metrics.
+
+    `metrics` maps metric names to objects such as ``prometheus_client``
+    Histograms or Counters. Histograms and Summaries are observed, and
+    Counters incremented, by each value. Metrics declared with a
+    ``technique`` label are labelled with the technique's path.
+    Unmapped metrics are ignored.
+    """
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def record(self, metric, value, technique=None):
+        target = self.metrics.get(metric)
+        if target is None:
+            return
+        if 'technique' in getattr(target, '_labelnames', ()):
+            target = target.labels(technique=technique or "")
+        if hasattr(target, 'observe'):
+            target.observe(value)
+        else:
+            target.inc(value)
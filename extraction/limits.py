@@ -0,0 +1,85 @@
+"""
+Bounding the work done on pathological documents.
+
+Parsing is by far the most expensive part of extraction, and its cost
+grows with the size of the document, so a 50 MB body or a page with a
+million tags can stall a worker for seconds. Extractors can be given
+limits which are enforced before parsing, by truncating the source::
+
+    >>> extractor = Extractor(max_bytes=2 ** 20, max_nodes=50000, technique_timeout=0.5)
+    >>> extracted = extractor.extract(html)
+    >>> extracted.truncated
+    ['bytes']
+
+Documents over `max_bytes` are cut where their head ends, so that the
+parsers see the head, where most metadata lives, and none of the body.
+If the head alone is over the limit, it is cut just before the last
+tag which fits.
+"""
+from extraction.stream import find_head_end
+
+
+# reasons recorded in the `truncated` results of a document
+BYTES = "bytes"
+NODES = "nodes"
+TIMEOUT = "timeout"
+
+
+def exceeds_bytes(html, max_bytes):
+    """
+    Return True if `html` is longer than `max_bytes`.
+
+    Strings are measured by the length of their UTF-8 encoding, and
+    bytes before being decoded.
+    """
+    if len(html) > max_bytes:
+        return True
+    if not isinstance(html, str) or len(html) * 4 <= max_bytes or html.isascii():
+        return False
+    return len(html.encode('utf-8', 'surrogatepass')) > max_bytes
+
+
+def truncate_bytes(html, max_bytes):
+    """
+    Return `html`, a string or bytes-like object, cut to at most `max_bytes`.
+
+    Strings are measured as by ``exceeds_bytes``. The document is cut
+    where its head ends, or just before the last tag which fits if the
+    head doesn't. Returns None if `html` is already within the limit.
+    """
+    if not exceeds_bytes(html, max_bytes):
+        return None
+    if isinstance(html, str):
+        # the characters whose encoding fits, ending before a continuation byte
+        encoded = html[:max_bytes + 1].encode('utf-8', 'surrogatepass')
+        end = max_bytes
+        while encoded[end] & 0xc0 == 0x80:
+            end -= 1
+        end = len(encoded[:end].decode('utf-8', 'surrogatepass'))
+        text = html[:end + 1]
+    else:
+        html = memoryview(html)
+        end = max_bytes
+        # tags are ASCII, so decoding as latin-1 finds them at the same offsets
+        text = bytes(html[:end + 1]).decode('latin-1')
+    head_end = find_head_end(text[:end])
+    if 0 < head_end < end:
+        return html[:head_end]
+    cut = text.rfind("<")
+    return html[:cut if cut > 0 else end]
+
+
+def truncate_nodes(html, max_nodes):
+    """
+    Return `html` cut just before its tag number `max_nodes` + 1.
+
+    Tags, comments and doctypes are counted by the ``<`` which starts
+    them, which slightly overestimates the nodes a parser would build
+    from malformed documents. Returns None if `html` is within the limit.
+    """
+    if html.count("<") <= max_nodes:
+        return None
+    position = -1
+    for _ in range(max_nodes + 1):
+        position = html.find("<", position + 1)
+    return html[:position]
@@ -0,0 +1,175 @@
+"""
+Parser backends used to build the tree that techniques search.
+
+Backends are looked up by name, for example::
+
+    >>> from extraction.parsers import get_parser
+    >>> soup = get_parser("lxml")("<title>Hi</title>")
+    >>> soup.find('title').string
+    'Hi'
+
+``html5lib``, ``lxml`` and ``html.parser`` are BeautifulSoup tree
+builders. ``selectolax`` uses the lexbor engine from the optional
+`selectolax <https://github.com/rushter/selectolax>`_ package, wrapped
+to offer the subset of the BeautifulSoup API the built-in techniques
+rely on (``find``, ``find_all``, ``attrs``, ``string`` and ``strings``).
+"""
+import bs4
+
+
+DEFAULT_PARSER = "html5lib"
+
+# attributes which BeautifulSoup splits into lists of values
+MULTI_VALUED_ATTRIBUTES = ("class", "rel", "rev", "accept-charset", "headers", "accesskey", "dropzone")
+
+
+class SelectolaxTag(object):
+    "Wraps a selectolax node with a BeautifulSoup-like interface."
+
+    def __init__(self, node):
+        self.node = node
+        self.name = node.tag
+        self._attrs = None
+
+    def __repr__(self):
+        return "<SelectolaxTag %s>" % self.name
+
+    @property
+    def attrs(self):
+        "Attributes of the tag, with multi-valued attributes split into lists."
+        if self._attrs is None:
+            attrs = {}
+            for key, value in self.node.attributes.items():
+                if value is None:
+                    value = ""
+                if key in MULTI_VALUED_ATTRIBUTES:
+                    value = value.split()
+                attrs[key] = value
+            self._attrs = attrs
+        return self._attrs
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.attrs
+
+    @property
+    def string(self):
+        "The lone string inside this tag, following BeautifulSoup's rules."
+        children = [x for x in self.node.iter(include_text=True) if x.tag != "-comment"]
+        if len(children) != 1:
+            return None
+        child = children[0]
+        if child.tag == "-text":
+            return child.text_content
+        return SelectolaxTag(child).string
+
+    @property
+    def strings(self):
+        "Yield every text node beneath this tag, in document order."
+        for node in self._descendants(include_text=True):
+            if node.tag == "-text":
+                yield node.text_content
+
+    def _descendants(self, include_text=False):
+        nodes = self.node.traverse(include_text=include_text)
+        next(nodes, None)  # traverse() starts with the node itself
+        return nodes
+
+    def _matches(self, node, names, attrs):
+        if names is not True and node.tag not in names:
+            return False
+        for key, value in attrs.items():
+            actual = node.attributes.get(key)
+            if actual is None:
+                return False
+            if key in MULTI_VALUED_ATTRIBUTES:
+                if value not in actual.split():
+                    return False
+            elif actual != value:
+                return False
+        return True
+
+    def find_all(self, name=True, limit=None, **kwargs):
+        "Return all descendant tags matching `name` and attribute filters."
+        if isinstance(name, str):
+            names = (name,)
+        else:
+            names = name
+        if 'class_' in kwargs:
+            kwargs['class'] = kwargs.pop('class_')
+        found = []
+        for node in self._descendants():
+            if node.tag.startswith("-"):
+                continue
+            if self._matches(node, names, kwargs):
+                found.append(SelectolaxTag(node))
+                if limit and len(found) >= limit:
+                    break
+        return found
+
+    def find(self, name=True, **kwargs):
+        "Return the first descendant tag matching `name`, if any."
+        found = self.find_all(name, limit=1, **kwargs)
+        return found[0] if found else None
+
+
+class SelectolaxDocument(SelectolaxTag):
+    "Root of a selectolax parse, so searches include the html element itself."
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.name = "[document]"
+        self._attrs = {}
+
+    def __repr__(self):
+        return "<SelectolaxDocument>"
+
+    @property
+    def node(self):
+        return self.tree.root
+
+    def _descendants(self, include_text=False):
+        if self.tree.root is None:
+            return iter(())
+        return self.tree.root.traverse(include_text=include_text)
+
+    @property
+    def string(self):
+        return None
+
+
+def bs4_parser(features):
+    "Return a function which parses HTML with the named BeautifulSoup builder."
+    def parse(html):
+        return bs4.BeautifulSoup(html, features=features)
+    return parse
+
+
+def selectolax_parser():
+    "Return a function which parses HTML with selectolax's lexbor engine."
+    from selectolax.lexbor import LexborHTMLParser
+
+    def parse(html):
+        return SelectolaxDocument(LexborHTMLParser(html))
+    return parse
+
+
+def get_parser(name):
+    """
+    Return the parse function for the backend called `name`.
+
+    Raises ``ValueError`` for unknown backends, and ``ImportError``
+    if the backend's library isn't installed.
+    """
+    if name == "selectolax":
+        return selectolax_parser()
+    if name in ("html5lib", "lxml", "html.parser"):
+        if bs4.builder.builder_registry.lookup(name) is None:
+            raise ImportError("parser %r is not installed" % name)
+        return bs4_parser(name)
+    raise ValueError("unknown parser %r" % name)
@@ -0,0 +1,247 @@
+"""
+Tree-free scanning of title, meta and link tags.
+
+Head-only techniques only look at ``<title>``, ``<meta>`` and ``<link>``
+tags, so building a tree of the whole document is mostly wasted work.
+The scanner tokenizes the raw text instead, following the HTML5 rules
+for tag and attribute syntax, character references, comments and the
+raw text of ``<script>``, ``<style>`` and friends, and returns tag-like
+objects for just those tags::
+
+    >>> from extraction.scanner import scan
+    >>> tags = scan('<title>Caf&eacute;</title><meta property="og:title" content="Hi">', ['title', 'meta'])
+    >>> tags['title'][0].string, tags['meta'][0]['content']
+    ('Café', 'Hi')
+
+Whenever the scanner can't be sure it would find the same tags as a
+parser, for example within ``<template>`` or ``<svg>`` elements, or in
+unterminated comments, ``scan`` returns None and the document should
+be parsed as usual.
+"""
+import html
+import html.entities
+import re
+
+import bs4
+
+
+# tags the scanner can find
+SCANNABLE_TAGS = frozenset(["title", "meta", "link"])
+
+# elements whose contents are text rather than markup
+RAWTEXT_TAGS = frozenset(["script", "style", "xmp", "iframe", "noembed", "noframes", "textarea"])
+
+# elements within which parsers treat title, meta and link tags differently
+UNSURE_TAGS = frozenset(["template", "frameset"])
+FOREIGN_TAGS = frozenset(["svg", "math"])
+
+# attributes which BeautifulSoup splits into lists of values, by tag name
+MULTI_VALUED_ATTRIBUTES = bs4.builder.HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+
+TAG_NAME_RE = re.compile(r"[^\t\n\f\r />]*")
+ATTRIBUTE_RE = re.compile(r"""[\t\n\f\r /]*(?:(>)|([^\t\n\f\r />=][^\t\n\f\r />=]*)"""
+                          r"""(?:[\t\n\f\r ]*=[\t\n\f\r ]*(?:"([^"]*)"|'([^']*)'|(?!["'])([^\t\n\f\r >]*)))?)""")
+COMMENT_END_RE = re.compile(r"--!?>")
+REFERENCE_RE = re.compile(r"&(?:#[0-9]+;?|#[xX][0-9a-fA-F]+;?|([A-Za-z][A-Za-z0-9]*)(;?))")
+FOREIGN_CONTENT_RE = re.compile(r"<(?:title|meta|link|svg|math)[\t\n\f\r />]", re.IGNORECASE)
+
+_close_tag_res = {}
+
+
+def close_tag_re(name):
+    "Return a regex finding the end tag which closes a raw text element."
+    if name not in _close_tag_res:
+        _close_tag_res[name] = re.compile(r"</%s[\t\n\f\r />]" % name, re.IGNORECASE)
+    return _close_tag_res[name]
+
+
+class ScannedTag(object):
+    "A tag found by the scanner, with the parts of the BeautifulSoup interface techniques use."
+
+    def __init__(self, name, attrs, string=None):
+        self.name = name
+        self.attrs = attrs
+        self.string = string
+
+    def __repr__(self):
+        return "<ScannedTag %s %r>" % (self.name, self.attrs)
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.attrs
+
+    @property
+    def strings(self):
+        if self.string is not None:
+            yield self.string
+
+    def find_all(self, name=True, limit=None, **kwargs):
+        return []
+
+    def find(self, name=True, **kwargs):
+        return None
+
+
+def unescape_reference(match):
+    "Decode a character reference within an attribute value, following HTML5's rules."
+    name, semicolon = match.group(1), match.group(2)
+    if name is None:
+        return html.unescape(match.group(0))
+    if semicolon and name + ";" in html.entities.html5:
+        return html.entities.html5[name + ";"]
+    # references without a semicolon are only decoded in attributes if
+    # they are complete and not followed by an equals sign
+    if not semicolon and name in html.entities.html5 and match.string[match.end():match.end() + 1] != "=":
+        return html.entities.html5[name]
+    return match.group(0)
+
+
+def unescape_attribute(value):
+    if "&" not in value:
+        return value
+    return REFERENCE_RE.sub(unescape_reference, value)
+
+
+def parse_attributes(text, position):
+    """
+    Return (attributes, end) for the attributes of a tag starting at `position`.
+
+    `end` is the position after the tag's closing ``>``. Returns None
+    if the tag is unterminated or has duplicate attributes.
+    """
+    attrs = {}
+    while True:
+        match = ATTRIBUTE_RE.match(text, position)
+        if match is None:
+            return None
+        position = match.end()
+        if match.group(1):
+            return attrs, position
+        name = match.group(2).lower()
+        if name in attrs:
+            return None
+        value = match.group(3)
+        if value is None:
+            value = match.group(4)
+        if value is None:
+            value = match.group(5) or ""
+        attrs[name] = value
+
+
+def scanned_tag(name, attrs):
+    "Return a ScannedTag with its attribute values decoded and multi-valued attributes split."
+    multi_valued = MULTI_VALUED_ATTRIBUTES.get('*', set()) | MULTI_VALUED_ATTRIBUTES.get(name, set())
+    decoded = {}
+    for key, value in attrs.items():
+        value = unescape_attribute(value)
+        if key in multi_valued:
+            value = value.split()
+        decoded[key] = value
+    return ScannedTag(name, decoded)
+
+
+def scan(text, names=SCANNABLE_TAGS):
+    """
+    Return a dictionary of tag name to the tags named `names` in `text`, in document order.
+
+    `names` must be a subset of ``SCANNABLE_TAGS``. Returns None if the
+    scanner can't be sure it would find the same tags as a parser.
+    """
+    if "\x00" in text:
+        return None
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+    found = dict((x, []) for x in names)
+    in_select = False
+    position = 0
+    while True:
+        position = text.find("<", position)
+        if position == -1:
+            break
+        following = text[position + 1:position + 2]
+
+        if following == "!" or following == "?":
+            if text.startswith("<!--", position):
+                if text.startswith("<!-->", position) or text.startswith("<!--->", position):
+                    position = text.index(">", position) + 1
+                    continue
+                end = COMMENT_END_RE.search(text, position + 4)
+                if end is None:
+                    return None
+                position = end.end()
+            else:
+                # doctypes and bogus comments end at the next >
+                end = text.find(">", position)
+                if end == -1:
+                    return None
+                position = end + 1
+            continue
+
+        if following == "/":
+            if not text[position + 2:position + 3].isalpha() or not text[position + 2].isascii():
+                end = text.find(">", position)
+                if end == -1:
+                    return None
+                position = end + 1
+                continue
+            name_end = TAG_NAME_RE.match(text, position + 2).end()
+            parsed = parse_attributes(text, name_end)
+            if parsed is None:
+                return None
+            if text[position + 2:name_end].lower() == "select":
+                in_select = False
+            position = parsed[1]
+            continue
+
+        if not following.isalpha() or not following.isascii():
+            position += 1
+            continue
+
+        name_end = TAG_NAME_RE.match(text, position + 1).end()
+        name = text[position + 1:name_end].lower()
+        parsed = parse_attributes(text, name_end)
+        if parsed is None or name in UNSURE_TAGS:
+            return None
+        attrs, position = parsed
+        if in_select and (name in RAWTEXT_TAGS or name == "plaintext") and name != "script":
+            # within a select, parsers ignore these rather than switching to raw text
+            return None
+
+        if name in FOREIGN_TAGS:
+            # svg and math are skipped, unless they might hold tags we're after
+            close = close_tag_re(name).search(text, position)
+            if close is None or FOREIGN_CONTENT_RE.search(text, position, close.start()):
+                return None
+            position = close.start()
+        elif name in RAWTEXT_TAGS:
+            close = close_tag_re(name).search(text, position)
+            if close is None:
+                return None
+            if name == "script" and "<!--" in text[position:close.start()]:
+                return None
+            position = close.start()
+        elif name == "plaintext":
+            break
+        elif name == "select":
+            in_select = True
+        elif name in SCANNABLE_TAGS:
+            if in_select:
+                return None
+            if name == "title":
+                close = close_tag_re(name).search(text, position)
+                if close is None:
+                    return None
+                tag = ScannedTag(name, scanned_tag(name, attrs).attrs,
+                                 html.unescape(text[position:close.start()]) or None)
+                position = close.start()
+            else:
+                tag = scanned_tag(name, attrs)
+            if name in found:
+                found[name].append(tag)
+    return found
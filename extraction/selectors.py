@@ -0,0 +1,94 @@
+"""
+Declarative selectors, compiled into one lookup for all techniques.
+
+Much of extraction is reading an attribute from tags identified by the
+value of another attribute, for example the ``content`` of the ``meta``
+tag whose ``property`` is ``og:title``. Rather than each technique
+looping over the tags itself, techniques declare these as ``Selector``
+rules::
+
+    >>> from extraction.selectors import Selector
+    >>> Selector('meta', 'property', 'og:title', 'content', 'titles')
+
+An extractor compiles the rules of all its techniques into a single
+``SelectorIndex``, mapping tag to key attribute to key value to the
+techniques and fields it feeds, and resolves every rule in one pass
+over the candidate elements of each document. Adding another family
+of meta tags adds entries to the index, not another walk of the tree.
+"""
+import collections
+
+
+Selector = collections.namedtuple('Selector', ('tag', 'key_attr', 'key', 'value_attr', 'field'))
+Selector.__doc__ = """
+Rule selecting `value_attr` of each `tag` whose `key_attr` is `key`, into `field`.
+
+For multi-valued attributes such as ``rel``, the rule matches tags
+where any of the values is `key`.
+"""
+
+
+class SelectorIndex(object):
+    "Selectors of several techniques compiled into one lookup structure."
+
+    def __init__(self, techniques=()):
+        """
+        Compile the ``selectors`` of each of `techniques`.
+
+        The index maps tag name to key attribute to key value to a list
+        of (technique, value_attr, field) destinations.
+        """
+        self.techniques = {}
+        self.index = {}
+        self.tag_fields = {}
+        for technique in techniques:
+            self.techniques[technique] = None
+            for selector in technique.selectors:
+                self.tag_fields.setdefault(selector.tag, set()).add(selector.field)
+                by_attr = self.index.setdefault(selector.tag, {})
+                by_key = by_attr.setdefault(selector.key_attr, {})
+                by_key.setdefault(selector.key, []).append((technique, selector.value_attr, selector.field))
+
+    def __contains__(self, technique):
+        return technique in self.techniques
+
+    def select(self, document):
+        """
+        Return the values selected from `document` for each technique.
+
+        Results are a dictionary of technique to a dictionary of field
+        to values, in document order. Fields the document doesn't want
+        are skipped, along with tags which can't produce any wanted fields.
+        """
+        fields = document.fields
+        results = dict((x, {}) for x in self.techniques)
+        for tag, by_attr in self.index.items():
+            if fields is not None and fields.isdisjoint(self.tag_fields[tag]):
+                continue
+            for element in document.elements(tag):
+                attrs = element.attrs
+                for key_attr, by_key in by_attr.items():
+                    keys = attrs.get(key_attr)
+                    if keys is None:
+                        continue
+                    if not isinstance(keys, list):
+                        keys = (keys,)
+                    for key in keys:
+                        for technique, value_attr, field in by_key.get(key, ()):
+                            if value_attr in attrs and (fields is None or field in fields):
+                                results[technique].setdefault(field, []).append(attrs[value_attr])
+        return results
+
+
+def select(document, technique):
+    """
+    Return a dictionary of field to the values `technique` selects from `document`.
+
+    Techniques are served from the document's shared index when they
+    are part of it, and otherwise from an index of their own, which
+    ``Technique`` compiles when it is created.
+    """
+    index = document.selectors
+    if index is None or technique not in index:
+        index = technique.__dict__.get('_selector_index') or SelectorIndex([technique])
+    return dict((field, list(values)) for field, values in document.selected(index)[technique].items())
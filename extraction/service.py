@@ -0,0 +1,419 @@
+"""
+Long-running extraction service, for crawlers which aren't written in Python.
+
+    $ extraction-service --port 8080 --workers 8
+    $ curl --data-binary @page.html "http://127.0.0.1:8080/extract?url=http://lethain.com/"
+    {"source_url": "http://lethain.com/", "extracted": {"titles": ["Digg v4's Architecture"], ...}}
+
+The service keeps a pool of worker processes, each holding a copy of
+the extractor with its techniques already resolved, and serves HTTP/1.1
+on a local port or, with ``--socket``, on a Unix socket. Connections
+are kept alive and the requests on each are answered in order, so
+clients may pipeline them. The endpoints are:
+
+* ``POST /extract``: the body is the HTML of one page, decoded with
+  the charset from its Content-Type header if there is one, and the
+  ``url`` query parameter is its source URL. The response holds its
+  ``source_url`` and ``extracted`` data.
+* ``POST /batch``: the body is JSON lines with ``html`` and optionally
+  ``url`` and ``id`` keys, as read by the ``extraction`` command, and the
+  response is JSON lines of each page's ``id``, ``source_url`` and
+  ``extracted`` data, or an ``error`` if it failed, in order. Pages
+  are sent to workers in chunks.
+* ``GET /stats``: pages waiting for the workers, request counts by
+  status, and recent latency percentiles of each endpoint.
+
+Once `max_pending` pages are waiting for workers, further requests are
+answered with 503, so clients can back off and retry.
+"""
+import argparse
+import collections
+import concurrent.futures
+import functools
+import http.server
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+import urllib.parse
+
+from extraction import Extracted, Extractor, batch, cli
+
+
+class Overloaded(Exception):
+    "Raised when accepting more pages would leave more than `max_pending` waiting for workers."
+
+
+def as_dict(extracted):
+    "Return results from ``Extractor`` or ``DictExtractor`` as a dictionary."
+    if isinstance(extracted, Extracted):
+        return extracted.as_dict()
+    return extracted
+
+
+def latency_summary(latencies):
+    "Return the count, mean, max and nearest-rank percentiles of a list of latencies in seconds."
+    ordered = sorted(latencies)
+    summary = {'count': len(ordered), 'mean': sum(ordered) / len(ordered), 'max': ordered[-1]}
+    for percentile in (50, 90, 99):
+        index = max(0, min(len(ordered) - 1, int(round(percentile / 100.0 * len(ordered))) - 1))
+        summary['p%d' % percentile] = ordered[index]
+    return summary
+
+
+class ExtractionService(object):
+    "Pool of warm workers extracting pages for the front end, keeping statistics about them."
+
+    def __init__(self, extractor=None, workers=None, executor="process", chunksize=16, max_pending=4096,
+                 timeout=None, max_body=64 * 2 ** 20, window=1000):
+        """
+        Create a service, which runs once ``start`` is called.
+
+        `extractor` defaults to an ``Extractor`` with the default
+        techniques, and is sent once to each of `workers` processes,
+        which default to one per CPU. With `executor` "thread" pages are
+        instead extracted by `workers` threads sharing the extractor,
+        which is frozen first.
+
+        Batches are sent to workers `chunksize` pages at a time. Requests
+        which would leave more than `max_pending` pages waiting are
+        refused, as are bodies over `max_body` bytes, and each request
+        waits at most `timeout` seconds for its results. Latencies are
+        summarized over the last `window` requests to each endpoint.
+        """
+        if executor not in ("process", "thread"):
+            raise ValueError("executor must be 'process' or 'thread'")
+        self.extractor = extractor or Extractor()
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = executor == "thread"
+        self.chunksize = chunksize
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.max_body = max_body
+        self.window = window
+        self.executor = None
+
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.pending_chunks = 0
+        self.extracted = 0
+        self.failed = 0
+        self.requests = collections.Counter()
+        self.latencies = {}
+        self.started = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        "Start the workers, returning once each is ready."
+        if self.threads:
+            self.extractor.freeze()
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers,
+                                                                   initializer=batch.init_worker,
+                                                                   initargs=(self.extractor,))
+        # extracting an empty page starts the workers and loads the parser
+        concurrent.futures.wait([self.run([("", None)]) for _ in range(self.workers)])
+        self.started = time.time()
+        return self
+
+    def close(self):
+        "Stop the workers, abandoning any pages still waiting for them."
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def run(self, chunk):
+        "Return a future for the results of a chunk of documents."
+        if self.threads:
+            return self.executor.submit(batch.extract_chunk, chunk, self.extractor, return_exceptions=True)
+        return self.executor.submit(batch.extract_chunk, chunk, return_exceptions=True)
+
+    def submit(self, documents):
+        """
+        Send (html, source_url, content_type) documents to the workers, returning a future for each chunk.
+
+        Raises ``Overloaded`` if that would leave more than `max_pending` pages waiting.
+        """
+        chunks = [documents[x:x + self.chunksize] for x in range(0, len(documents), self.chunksize)]
+        with self.lock:
+            if self.pending + len(documents) > self.max_pending:
+                raise Overloaded()
+            self.pending += len(documents)
+            self.pending_chunks += len(chunks)
+        futures = []
+        for chunk in chunks:
+            future = self.run(chunk)
+            future.add_done_callback(functools.partial(self.finished, len(chunk)))
+            futures.append(future)
+        return futures
+
+    def finished(self, pages, future):
+        "Update the statistics once a chunk of `pages` documents is done."
+        with self.lock:
+            self.pending -= pages
+            self.pending_chunks -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += pages
+            else:
+                failed = sum(isinstance(x, Exception) for x in future.result())
+                self.failed += failed
+                self.extracted += pages - failed
+
+    def extract(self, documents):
+        """
+        Extract a list of (html, source_url, content_type) documents, returning a dictionary for each.
+
+        Pages which fail have their exception returned in place of a
+        dictionary, so they don't lose the results of the others.
+
+        Raises ``Overloaded`` if the workers are too busy, and
+        ``concurrent.futures.TimeoutError`` if they take longer than `timeout`.
+        """
+        futures = self.submit(documents)
+        _, not_done = concurrent.futures.wait(futures, timeout=self.timeout)
+        if not_done:
+            for future in not_done:
+                future.cancel()
+            raise concurrent.futures.TimeoutError()
+        return [as_dict(x) for future in futures for x in future.result()]
+
+    def record(self, endpoint, status, seconds):
+        "Record a request to `endpoint` answered with `status` after `seconds`."
+        with self.lock:
+            self.requests[status] += 1
+            latencies = self.latencies.get(endpoint)
+            if latencies is None:
+                latencies = self.latencies[endpoint] = collections.deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def stats(self):
+        """
+        Return a dictionary of statistics about the service.
+
+        ``pending`` is the number of pages waiting for results, and
+        ``queue_depth`` the number of chunks of them no worker has
+        started on yet.
+        """
+        with self.lock:
+            return {'workers': self.workers,
+                    'pending': self.pending,
+                    'queue_depth': max(0, self.pending_chunks - self.workers),
+                    'extracted': self.extracted,
+                    'failed': self.failed,
+                    'requests': dict((str(status), count) for status, count in self.requests.items()),
+                    'latency_seconds': dict((endpoint, latency_summary(latencies))
+                                            for endpoint, latencies in self.latencies.items()),
+                    'uptime_seconds': time.time() - self.started if self.started else 0.0}
+
+
+class ExtractionRequestHandler(http.server.BaseHTTPRequestHandler):
+    "Serves the endpoints of the server's service, keeping connections alive for pipelining."
+    protocol_version = "HTTP/1.1"
+    server_version = "extraction"
+
+    def address_string(self):
+        # connections to Unix sockets have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.log_requests:
+            http.server.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def log_error(self, format, *args):
+        http.server.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def respond(self, status, body, content_type="application/json"):
+        "Send a response with a body, which is a string."
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def respond_error(self, status, message):
+        self.respond(status, json.dumps({"error": message}))
+
+    def read_body(self):
+        """
+        Return the request's body, or None after responding with an error.
+
+        If the body isn't read, the connection is closed, as the next
+        request on it can't be found.
+        """
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit() or "Transfer-Encoding" in self.headers:
+            self.close_connection = True
+            self.respond_error(411, "requests must have a Content-Length")
+            return None
+        if int(length) > self.server.service.max_body:
+            self.close_connection = True
+            self.respond_error(413, "request body is over %d bytes" % self.server.service.max_body)
+            return None
+        return self.rfile.read(int(length))
+
+    def do_GET(self):
+        start = time.perf_counter()
+        if urllib.parse.urlsplit(self.path).path == "/stats":
+            status = 200
+            self.respond(status, json.dumps(self.server.service.stats()))
+        else:
+            status = 404
+            self.respond_error(status, "not found")
+        self.server.service.record("stats", status, time.perf_counter() - start)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urllib.parse.urlsplit(self.path)
+        endpoint = url.path.strip("/")
+        if endpoint not in ("extract", "batch"):
+            self.close_connection = True
+            self.respond_error(404, "not found")
+            return
+        body = self.read_body()
+        if body is None:
+            return
+        status, content_type, response = self.handle_post(endpoint, url.query, body)
+        self.respond(status, response, content_type)
+        self.server.service.record(endpoint, status, time.perf_counter() - start)
+
+    def handle_post(self, endpoint, query, body):
+        "Return the status, content type and body of the response to a request to `endpoint`."
+        try:
+            if endpoint == "extract":
+                source_url = urllib.parse.parse_qs(query).get("url", [None])[0]
+                pages = [(None, body, source_url, None)]
+                documents = [(body, source_url, self.headers.get("Content-Type"))]
+            else:
+                pages = list(cli.read_jsonl(body.decode('utf-8').splitlines()))
+                documents = [(html, source_url, content_type) for _, html, source_url, content_type in pages]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return 400, "application/json", json.dumps({"error": "bad request: %s" % e})
+
+        try:
+            results = self.server.service.extract(documents)
+            if endpoint == "extract":
+                if isinstance(results[0], Exception):
+                    raise results[0]
+                return 200, "application/json", json.dumps({"source_url": pages[0][2], "extracted": results[0]})
+            lines = []
+            for (page_id, _, source_url, _), extracted in zip(pages, results):
+                if isinstance(extracted, Exception):
+                    self.log_error("extraction of %s failed: %r", page_id, extracted)
+                    lines.append(json.dumps({"id": page_id, "source_url": source_url,
+                                             "error": cli.describe_error(extracted)}))
+                else:
+                    lines.append(json.dumps({"id": page_id, "source_url": source_url, "extracted": extracted}))
+            return 200, "application/x-ndjson", "".join(x + "\n" for x in lines)
+        except Overloaded:
+            return 503, "application/json", json.dumps({"error": "too many pages pending"})
+        except concurrent.futures.TimeoutError:
+            return 504, "application/json", json.dumps({"error": "extraction timed out"})
+        except Exception as e:
+            self.log_error("extraction failed: %r", e)
+            return 500, "application/json", json.dumps({"error": "extraction failed: %s" % e})
+
+
+class ExtractionHTTPServer(http.server.ThreadingHTTPServer):
+    "Serves an ``ExtractionService`` on a TCP port, with a thread per connection."
+
+    def __init__(self, address, service, log_requests=False):
+        self.service = service
+        self.log_requests = log_requests
+        http.server.ThreadingHTTPServer.__init__(self, address, ExtractionRequestHandler)
+
+
+class ExtractionUnixServer(socketserver.ThreadingUnixStreamServer):
+    "Serves an ``ExtractionService`` on a Unix socket, with a thread per connection."
+    daemon_threads = True
+
+    def __init__(self, path, service, log_requests=False):
+        self.service = service
+        self.log_requests = log_requests
+        socketserver.ThreadingUnixStreamServer.__init__(self, path, ExtractionRequestHandler)
+
+    def server_close(self):
+        socketserver.ThreadingUnixStreamServer.server_close(self)
+        os.unlink(self.server_address)
+
+
+def remove_stale_socket(path):
+    "Remove the Unix socket at `path` if it was left behind by a server which is no longer running."
+    if not os.path.exists(path) or not stat.S_ISSOCK(os.stat(path).st_mode):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+    else:
+        raise OSError("%s is in use by a running server" % path)
+    finally:
+        probe.close()
+
+
+def make_server(service, host="127.0.0.1", port=8080, socket_path=None, log_requests=False):
+    "Return a server for `service` on a TCP port, or on a Unix socket if `socket_path` is given."
+    if socket_path is not None:
+        remove_stale_socket(socket_path)
+        return ExtractionUnixServer(socket_path, service, log_requests=log_requests)
+    return ExtractionHTTPServer((host, port), service, log_requests=log_requests)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="extraction-service", description="Serve extraction over HTTP "
+                                     "on a local port or Unix socket.")
+    cli.add_extractor_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--socket", default=None, help="Unix socket to listen on, instead of a port")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--threads", action="store_true",
+                        help="extract in threads of the service's process rather than worker processes")
+    parser.add_argument("--chunksize", type=int, default=16, help="pages of a batch sent to a worker at a time")
+    parser.add_argument("--max-pending", type=int, default=4096,
+                        help="pages which may wait for workers before requests are refused")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds each request may take")
+    parser.add_argument("--verbose", action="store_true", help="log every request on stderr")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, stderr=None):
+    "Run the extraction service until interrupted."
+    stderr = stderr or sys.stderr
+    args = parse_args(argv)
+    service = ExtractionService(Extractor(**cli.extractor_options(args)), workers=args.workers,
+                                executor="thread" if args.threads else "process", chunksize=args.chunksize,
+                                max_pending=args.max_pending, timeout=args.timeout)
+    with service:
+        server = make_server(service, host=args.host, port=args.port, socket_path=args.socket,
+                             log_requests=args.verbose)
+        stderr.write("serving on %s with %d workers\n" % (args.socket or "%s:%d" % server.server_address[:2],
+                                                           service.workers))
+        stderr.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
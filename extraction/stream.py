@@ -0,0 +1,99 @@
+"""
+Incremental tokenizing of HTML documents.
+
+Head-only techniques only ever look at the ``<head>`` of a page, so
+rather than parsing multi-megabyte bodies we can feed the document
+through an incremental tokenizer a chunk at a time and stop as soon
+as the head is over::
+
+    >>> from extraction.stream import find_head_end
+    >>> html = "<html><head><title>Hi</title></head><body>...</body></html>"
+    >>> html[:find_head_end(html)]
+    '<html><head><title>Hi</title>'
+"""
+import html.parser
+
+
+# tags which may appear within the head, anything else starts the body
+HEAD_TAGS = frozenset(["html", "head", "title", "meta", "link", "base",
+                       "script", "style", "noscript", "template"])
+
+
+class HeadEnded(Exception):
+    "Raised by ``HeadTokenizer`` to stop tokenizing once the head is over."
+
+
+class HeadTokenizer(html.parser.HTMLParser):
+    """
+    Tokenizer which records where the head of a document ends.
+
+    The head ends at a ``</head>`` or ``<body>`` tag, or at the first
+    tag which cannot appear within the head. Tags within a ``<noscript>``,
+    such as tracking pixels, don't end it, and titles are read as text,
+    so markup in them doesn't either.
+    """
+    def __init__(self):
+        html.parser.HTMLParser.__init__(self, convert_charrefs=False)
+        self.head_end = None
+        self.noscript = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body" or (tag not in HEAD_TAGS and not self.noscript):
+            self.stop()
+        elif tag == "title":
+            self.set_cdata_mode(tag)
+        elif tag == "noscript":
+            self.noscript = True
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in ("head", "html"):
+            self.stop()
+        elif tag == "noscript":
+            self.noscript = False
+
+    def stop(self):
+        self.head_end = self.getpos()
+        raise HeadEnded()
+
+
+def line_offset(text, position):
+    "Convert a (lineno, column) position from the tokenizer into an offset in text."
+    lineno, column = position
+    offset = 0
+    for _ in range(lineno - 1):
+        offset = text.index("\n", offset) + 1
+    return offset + column
+
+
+def read_head(chunks):
+    """
+    Feed chunks of text to the tokenizer until the head ends.
+
+    Returns the text before the end of the head; chunks after the
+    one in which the head ends are never consumed.
+    """
+    tokenizer = HeadTokenizer()
+    consumed = []
+    try:
+        for chunk in chunks:
+            consumed.append(chunk)
+            tokenizer.feed(chunk)
+    except HeadEnded:
+        text = "".join(consumed)
+        return text[:line_offset(text, tokenizer.head_end)]
+    return "".join(consumed)
+
+
+def find_head_end(html, chunk_size=4096):
+    """
+    Return the offset in `html` where its head ends.
+
+    The document is fed to the tokenizer `chunk_size` characters at a
+    time, so the body is never tokenized. If the head never ends, the
+    length of the document is returned.
+    """
+    chunks = (html[x:x + chunk_size] for x in range(0, len(html), chunk_size))
+    return len(read_head(chunks))
@@ -1,19 +1,84 @@
 "This file contains techniques for extracting data from HTML pages."
 import bs4
 
+from extraction.document import Document
+from extraction.selectors import Selector, SelectorIndex, select
+from extraction.text import collect_text
+
 
 def init_bs(html):
+    """
+    Return the parsed tree for an HTML document.
+
+    When `html` is a ``Document`` its shared tree is returned, so
+    techniques run by the same extractor only parse the page once.
+    """
+    if isinstance(html, Document):
+        return html.soup
     return bs4.BeautifulSoup(html, features="html5lib")
 
 
+def find_all(html, name):
+    """
+    Return all tags named `name` within an HTML document.
+
+    When `html` is a ``Document`` this is served from the elements it
+    gathered in its single pass over the tree.
+    """
+    if isinstance(html, Document):
+        return html.elements(name)
+    return init_bs(html).find_all(name)
+
+
+def find(html, name):
+    "Return the first tag named `name` within an HTML document, if any."
+    found = find_all(html, name)
+    if found:
+        return found[0]
+    return None
+
+
+def wanted(html, *fields):
+    """
+    Return True if any of `fields` was requested for an HTML document.
+
+    Documents extracted without a list of fields want everything.
+    """
+    requested = getattr(html, 'fields', None)
+    if requested is None:
+        return True
+    return any(x in requested for x in fields)
+
+
 class Technique(object):
+    # techniques which only look at tags within the head set this to
+    # True, allowing streaming extractors to skip parsing the body
+    head_only = False
+
+    # names of the tags this technique searches for, which extractors
+    # gather for all their techniques in one pass over each page
+    tags = ()
+
+    # data types this technique can produce, which lets extractors skip
+    # it when those aren't requested. None means it could produce anything.
+    fields = None
+
     def __init__(self, extractor=None, *args, **kwargs):
         """
         Capture the extractor this technique is running within,
         if any.
         """
         self.extractor = extractor
+        if getattr(self, 'selectors', None):
+            # compiled up front, as extracting never modifies a technique
+            self._selector_index = SelectorIndex([self])
         super(Technique, self).__init__(*args, **kwargs)
+
+    def document(self, html):
+        "Return `html` as a ``Document``, so it is only parsed once."
+        if isinstance(html, Document):
+            return html
+        return Document(html, tags=self.tags)
     
     def extract(self, html):
         "Extract data from a string representing an HTML document."
@@ -24,6 +89,33 @@ class Technique(object):
                 }
 
 
+class SelectorTechnique(Technique):
+    """
+    Technique defined entirely by ``Selector`` rules, for example::
+
+        class DublinCoreTags(SelectorTechnique):
+            head_only = True
+            selectors = [Selector('meta', 'name', 'DC.title', 'content', 'titles'),
+                         Selector('meta', 'name', 'DC.description', 'content', 'descriptions')]
+
+    Extractors resolve the selectors of all their techniques together,
+    in one pass over the candidate elements of each page.
+    """
+    selectors = ()
+
+    @property
+    def tags(self):
+        return tuple(sorted(set(x.tag for x in self.selectors)))
+
+    @property
+    def fields(self):
+        return set(x.field for x in self.selectors)
+
+    def extract(self, html):
+        "Extract the values of each selector."
+        return select(self.document(html), self)
+
+
 class HeadTags(Technique):
     """
     Extract info from standard HTML metatags like title, for example:
@@ -44,28 +136,32 @@ class HeadTags(Technique):
         "description": "descriptions",
         "author": "authors",
         }
+    head_only = True
+    tags = ('title', 'meta', 'link')
+
+    @property
+    def fields(self):
+        return set(['titles', 'urls', 'feeds']).union(self.meta_name_map.values())
+
+    @property
+    def selectors(self):
+        return [Selector('meta', 'name', name, 'content', dest) for name, dest in self.meta_name_map.items()]
 
     def extract(self, html):
         "Extract data from meta, link and title tags within the head tag."
         extracted = {}
-        soup = init_bs(html)
+        html = self.document(html)
         # extract data from title tag
-        title_tag = soup.find('title')
+        title_tag = wanted(html, 'titles') and find(html, 'title')
         if title_tag:
             extracted['titles'] = [title_tag.string]
 
         # extract data from meta tags
-        for meta_tag in soup.find_all('meta'):
-            if 'name' in meta_tag.attrs and 'content' in meta_tag.attrs:
-                name = meta_tag['name']
-                if name in self.meta_name_map:
-                    name_dest = self.meta_name_map[name]
-                    if name_dest not in extracted:
-                        extracted[name_dest] = []
-                    extracted[name_dest].append(meta_tag.attrs['content'])
+        extracted.update(select(html, self))
 
         # extract data from link tags
-        for link_tag in soup.find_all('link'):
+        link_tags = find_all(html, 'link') if wanted(html, 'urls', 'feeds') else []
+        for link_tag in link_tags:
             if 'rel' in link_tag.attrs:
                 if ('canonical' in link_tag['rel'] or link_tag['rel'] == 'canonical') and 'href' in link_tag.attrs:
                     if 'urls' not in extracted:
@@ -78,7 +174,7 @@ class HeadTags(Technique):
         return extracted
 
 
-class FacebookOpengraphTags(Technique):
+class FacebookOpengraphTags(SelectorTechnique):
     """
     Extract info from html Facebook Opengraph meta tags.
 
@@ -103,6 +199,8 @@ class FacebookOpengraphTags(Technique):
     There are a bunch of other opengraph tags, but they don't seem
     useful to extraction's intent at this point.
     """
+    head_only = True
+    tags = ('meta',)
     key_attr = 'property'
     property_map = {
         'og:title': 'titles',
@@ -111,20 +209,9 @@ class FacebookOpengraphTags(Technique):
         'og:description': 'descriptions',
         }
 
-    def extract(self, html):
-        "Extract data from Facebook Opengraph tags."
-        extracted = {}
-        soup = init_bs(html)
-        for meta_tag in soup.find_all('meta'):
-            if self.key_attr in meta_tag.attrs and 'content' in meta_tag.attrs:
-                property = meta_tag[self.key_attr]
-                if property in self.property_map:
-                    property_dest = self.property_map[property]
-                    if property_dest not in extracted:
-                        extracted[property_dest] = []
-                    extracted[property_dest].append(meta_tag.attrs['content'])
-
-        return extracted
+    @property
+    def selectors(self):
+        return [Selector('meta', self.key_attr, key, 'content', dest) for key, dest in self.property_map.items()]
 
 
 class TwitterSummaryCardTags(FacebookOpengraphTags):
@@ -166,22 +253,26 @@ class HTML5SemanticTags(Technique):
     of cases where it hits, and otherwise expects `SemanticTags` to run sweep
     behind it for the lower quality, more abundant hits it discovers.
     """
-    
+    tags = ('article', 'video')
+    fields = ('titles', 'descriptions', 'videos')
+
     def extract(self, html):
         "Extract data from HTML5 semantic tags."
+        html = self.document(html)
         titles = []
         descriptions = []
         videos = []
-        soup = init_bs(html)
-        for article in soup.find_all('article') or []:
+        max_length = getattr(self.extractor, 'max_description_length', None)
+        articles = find_all(html, 'article') if wanted(html, 'titles', 'descriptions') else []
+        for article in articles:
             title = article.find('h1')
             if title:
-                titles.append(u" ".join(title.strings))
+                titles.append(collect_text(title.strings))
             desc = article.find('p')
             if desc:
-                descriptions.append(u" ".join(desc.strings))
+                descriptions.append(collect_text(desc.strings, max_length))
 
-        for video in soup.find_all('video') or []:
+        for video in find_all(html, 'video') if wanted(html, 'videos') else []:
             for source in video.find_all('source') or []:
                 if 'src' in source.attrs:
                     videos.append(source['src'])
@@ -207,20 +298,30 @@ class SemanticTags(Technique):
                       ]
     # format is ("name of tag", "destination list", "name of attribute" store_first_n)
     extract_attr = [('img', 'images', 'src', 10)]
-    
+    tags = ('h1', 'h2', 'h3', 'p', 'img')
+
+    @property
+    def fields(self):
+        return set([x[1] for x in self.extract_string] + [x[1] for x in self.extract_attr])
+
     def extract(self, html):
         "Extract data from usual semantic tags."
         extracted = {}
-        soup = init_bs(html)
-        
+        html = self.document(html)
+        max_length = getattr(self.extractor, 'max_description_length', None)
+
         for tag, dest, max_to_store in self.extract_string:
-            for found in soup.find_all(tag)[:max_to_store] or []:
+            if not wanted(html, dest):
+                continue
+            for found in find_all(html, tag)[:max_to_store]:
                 if dest not in extracted:
                     extracted[dest] = []
-                extracted[dest].append(u" ".join(found.strings))
+                extracted[dest].append(collect_text(found.strings, max_length if dest == 'descriptions' else None))
 
         for tag, dest, attribute, max_to_store in self.extract_attr:
-            for found in soup.find_all(tag)[:max_to_store] or []:
+            if not wanted(html, dest):
+                continue
+            for found in find_all(html, tag)[:max_to_store]:
                 if attribute in found.attrs:
                     if dest not in extracted:
                         extracted[dest] = []
@@ -1,8 +1,109 @@
+import asyncio
+import concurrent.futures
+import gzip
+import http.client
+import io
+import json
+import os
+import pickle
+import socket
+import tempfile
+import threading
+import time
 import unittest
 import extraction
+from extraction.aio import AsyncExtractor
+from extraction.benchmarks import corpus, suite
+from extraction import cli, incremental, limits
+from extraction.archive import iter_pages, iter_records
+from extraction.cache import LRUCache, SqliteCache
+from extraction.encoding import decode, sniff_charset
+from extraction.instrument import CallbackSink, StatsSink
+from extraction.document import Document
+from extraction.selectors import Selector
+from extraction.stream import find_head_end
+from extraction.service import ExtractionService, make_server
+from extraction.techniques import SelectorTechnique, Technique, init_bs
+from extraction.text import NormalizedText, collect_text
+from extraction.urls import URLNormalizer
+from extraction.tests import data
 from extraction.tests.data import *
 from extraction.examples.new_return_type import AddressExtractor
 
+# a tracking pixel, and markup in the title, which don't end the head
+PIXEL_HTML = ('<html><head><title>T</title><noscript><img src="http://example.com/p.gif"></noscript>'
+              '<meta property="og:title" content="OG"><link rel="canonical" href="http://example.com/c">'
+              '</head><body><p>hi</p></body></html>')
+TITLE_MARKUP_HTML = ('<html><head><title>a <b>c</b></title><meta property="og:title" content="OG"></head>'
+                     '<body><p>x</p></body></html>')
+
+
+def warc_record(record_type, uri, payload, content_type, record_id):
+    "Build a WARC record, for testing extraction from archives."
+    headers = ("WARC/1.0\r\nWARC-Type: %s\r\nWARC-Record-ID: %s\r\nWARC-Target-URI: %s\r\n"
+               "Content-Type: %s\r\nContent-Length: %d\r\n\r\n" % (record_type, record_id, uri, content_type, len(payload)))
+    return headers.encode('utf-8') + payload + b"\r\n\r\n"
+
+
+def http_response(body, content_type, extra_headers=""):
+    "Build an HTTP response, as stored in WARC response records."
+    headers = "HTTP/1.1 200 OK\r\nContent-Type: %s\r\n%s\r\n" % (content_type, extra_headers)
+    return headers.encode('utf-8') + body
+
+
+def corrupt_responses(uri):
+    "Build WARC response records whose gzip and chunked bodies can't be decoded."
+    return b"".join(warc_record("response", uri, http_response(body, "text/html", extra_headers),
+                                "application/http; msgtype=response", record_id)
+                    for body, extra_headers, record_id in
+                    ((b"not gzip", "Content-Encoding: gzip\r\n", "<urn:gzip>"),
+                     (b"zz\r\nabc\r\n0\r\n\r\n", "Transfer-Encoding: chunked\r\n", "<urn:chunked>")))
+
+
+def read_response(fin):
+    "Read an HTTP response from a file, returning its status, headers and body."
+    status = int(fin.readline().split()[1])
+    headers = {}
+    for line in iter(fin.readline, b"\r\n"):
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, fin.read(int(headers["content-length"]))
+
+
+class RecordingTechnique(Technique):
+    "Records the tree it was handed, for checking how often pages are parsed."
+    parsed = []
+
+    def extract(self, html):
+        self.parsed.append(init_bs(html))
+        return {}
+
+
+class SlowTechnique(Technique):
+    "Takes a while, for checking timeouts and concurrency limits."
+    delay = 0.2
+
+    def extract(self, html):
+        time.sleep(self.delay)
+        return {'titles': [html]}
+
+
+class PickyTechnique(Technique):
+    "Fails on pages mentioning it, for checking one page can't stop the others."
+
+    def extract(self, html):
+        if "picky" in html:
+            raise ValueError("too picky")
+        return {}
+
+
+class KeywordTags(SelectorTechnique):
+    "Declarative technique, for checking selectors are resolved together."
+    head_only = True
+    selectors = [Selector('meta', 'name', 'keywords', 'content', 'keywords'),
+                 Selector('link', 'rel', 'canonical', 'href', 'urls')]
+
+
 class TestSequenceFunctions(unittest.TestCase):
     def setUp(self):
         self.extractor = extraction.Extractor()
@@ -136,5 +237,750 @@ class TestSequenceFunctions(unittest.TestCase):
         extracted = self.extractor.extract(EMPTY_TITLE_HTML)
         self.assertEqual(extracted.title, "H1")
 
+    def test_document_parsed_once(self):
+        "Techniques run by one extractor should share a single parsed tree."
+        del RecordingTechnique.parsed[:]
+        self.extractor.techniques = ["extraction.tests.tests.RecordingTechnique",
+                                     "extraction.tests.tests.RecordingTechnique"]
+        self.extractor.extract(LETHAIN_COM_HTML)
+        parsed = RecordingTechnique.parsed
+        self.assertEqual(len(parsed), 2)
+        self.assertTrue(parsed[0] is parsed[1])
+
+        # raw strings still work, and still produce the same results
+        doc = Document(LETHAIN_COM_HTML)
+        self.assertTrue(isinstance(doc, str))
+        self.assertEqual(init_bs(doc).title.string, init_bs(LETHAIN_COM_HTML).title.string)
+
+    def test_parser_backends_conform(self):
+        "Built-in techniques should extract the same data under every parser backend."
+        techniques = extraction.DictExtractor.techniques
+        pages = [getattr(data, x) for x in dir(data) if x.endswith('_HTML')] + [""]
+        for parser in ("lxml", "html.parser", "selectolax"):
+            try:
+                extraction.parsers.get_parser(parser)
+            except ImportError:
+                continue
+            for technique in techniques:
+                expected_extractor = extraction.DictExtractor(techniques=[technique])
+                extractor = extraction.DictExtractor(techniques=[technique], parser=parser)
+                for page in pages:
+                    self.assertEqual(extractor.extract(page), expected_extractor.extract(page),
+                                     "%s differs under %s" % (technique, parser))
+
+    def test_unknown_parser(self):
+        "Unknown parser backends should be rejected when the extractor is built."
+        self.assertRaises(ValueError, extraction.Extractor, parser="not-a-parser")
+
+    def test_streaming_head_only(self):
+        "Streaming extractors with head-only techniques should only parse the head."
+        techniques = ["extraction.techniques.FacebookOpengraphTags",
+                      "extraction.techniques.TwitterSummaryCardTags",
+                      "extraction.techniques.HeadTags"]
+        streaming = extraction.DictExtractor(techniques=techniques, streaming=True)
+        self.assertTrue(streaming.head_only())
+        for page in (LETHAIN_COM_HTML, FACEBOOK_HTML, TWITTER_HTML, DUPLICATES_HTML, PIXEL_HTML, TITLE_MARKUP_HTML):
+            self.assertEqual(streaming.extract(page),
+                             extraction.DictExtractor(techniques=techniques).extract(page))
+        self.assertEqual(streaming.extract(PIXEL_HTML), {'titles': ['OG', 'T'], 'urls': ['http://example.com/c']})
+        self.assertEqual(streaming.extract(TITLE_MARKUP_HTML)['titles'], ['OG', 'a <b>c</b>'])
+        self.assertEqual(PIXEL_HTML[find_head_end(PIXEL_HTML):], "</head><body><p>hi</p></body></html>")
+        self.assertEqual(find_head_end("<head><noscript><img></noscript><div>"), 32)
+
+        doc = Document(LETHAIN_COM_HTML, head_only=True)
+        self.assertTrue(doc.soup.find('title'))
+        self.assertFalse(doc.soup.find('p'))
+
+        # body techniques force the full tree to be built
+        streaming.techniques = techniques + ["extraction.techniques.SemanticTags"]
+        self.assertFalse(streaming.head_only())
+        extracted = streaming.extract(LETHAIN_COM_HTML)
+        self.assertEqual(extracted['titles'][0],
+                         "Digg v4's Architecture and Development Processes - Irrational Exuberance")
+        self.assertEqual(len(extracted['images']), 2)
+
+    def test_document_elements_single_pass(self):
+        "Documents should gather every registered tag in one walk of the tree."
+        doc = Document(LETHAIN_COM_HTML, tags=self.extractor.technique_tags())
+        walks = []
+        find_all = doc.soup.find_all
+        doc.soup.find_all = lambda *args, **kwargs: walks.append(args) or find_all(*args, **kwargs)
+        for tag in ('meta', 'link', 'title', 'h1', 'p', 'img', 'article'):
+            self.assertEqual(doc.elements(tag), find_all(tag))
+        self.assertEqual(len(walks), 1)
+
+        self.extractor.extract(doc)
+        self.assertEqual(len(walks), 1)
+
+    def test_techniques_resolved_once(self):
+        "Techniques should be instantiated when assigned, and reused for every page."
+        self.extractor.techniques = ["extraction.tests.tests.RecordingTechnique"]
+        technique = self.extractor._resolved.techniques[0][1]
+        self.assertTrue(isinstance(technique, RecordingTechnique))
+        self.assertTrue(technique.extractor is self.extractor)
+        self.extractor.extract(LETHAIN_COM_HTML)
+        self.extractor.extract(DUPLICATES_HTML)
+        self.assertTrue(self.extractor._resolved.techniques[0][1] is technique)
+
+    def test_run_technique_override(self):
+        "Subclasses overriding run_technique should have it called for every technique."
+        calls = []
+
+        class CountingExtractor(extraction.DictExtractor):
+            def run_technique(self, technique, html):
+                calls.append(technique)
+                return super(CountingExtractor, self).run_technique(technique, html)
+
+        expected = extraction.DictExtractor().extract(LETHAIN_COM_HTML)
+        self.assertEqual(CountingExtractor().extract(LETHAIN_COM_HTML), expected)
+        self.assertEqual(calls, list(extraction.DictExtractor.techniques))
+        del calls[:]
+        CountingExtractor(instrument=StatsSink()).extract(LETHAIN_COM_HTML)
+        self.assertEqual(calls, list(extraction.DictExtractor.techniques))
+
+    def test_bad_technique_fails_fast(self):
+        "Bad technique paths should fail when assigned rather than on the first page."
+        self.assertRaises(ImportError, extraction.Extractor, techniques=["extraction.nope.Technique"])
+        self.assertRaises(AttributeError, extraction.Extractor, techniques=["extraction.techniques.Nope"])
+        techniques, config = self.extractor.techniques, self.extractor.cache_config()
+        def reassign():
+            self.extractor.techniques = ["extraction.techniques.Nope"]
+        self.assertRaises(AttributeError, reassign)
+        # the extractor keeps the techniques it can still run
+        self.assertTrue(self.extractor.techniques is techniques)
+        self.assertEqual(self.extractor.cache_config(), config)
+        self.assertEqual([x for x, _ in self.extractor._resolved.techniques], list(techniques))
+
+    def test_extract_many(self):
+        "Extracting many pages across processes should match extracting them one by one."
+        pages = [(LETHAIN_COM_HTML, "http://lethain.com/digg-v4-architecture-process/"),
+                 (FACEBOOK_HTML, None), (TWITTER_HTML, None), (HTML5_HTML, None), ("", None)]
+        expected = [self.extractor.extract(html, source_url=url).titles for html, url in pages]
+        # bare strings are treated as pages without a source_url
+        pages[1] = FACEBOOK_HTML
+
+        extracted = list(self.extractor.extract_many(pages, workers=2, chunksize=2))
+        self.assertEqual([x.titles for x in extracted], expected)
+
+        unordered = list(self.extractor.extract_many(pages, workers=2, chunksize=1, ordered=False))
+        self.assertEqual(sorted(x[0] for x in unordered), list(range(len(pages))))
+        for index, result in unordered:
+            self.assertEqual(result.titles, expected[index])
+
+        in_process = list(self.extractor.extract_many(pages, workers=0))
+        self.assertEqual([x.titles for x in in_process], expected)
+
+        # bytes with a Content-Type, in and out of process
+        utf16 = "<title>caf\xe9</title>".encode("utf-16-le")
+        triples = [(utf16, None, "text/html; charset=utf-16-le"), (LETHAIN_COM_HTML, None, None)]
+        for workers in (0, 2):
+            extracted = list(self.extractor.extract_many(triples, workers=workers))
+            self.assertEqual([x.title for x in extracted], ["caf\xe9", expected[0][0]])
+            unordered = list(self.extractor.extract_many(triples, workers=workers, ordered=False))
+            self.assertEqual(sorted((i, x.title) for i, x in unordered), [(0, "caf\xe9"), (1, expected[0][0])])
+
+        # bare bytes-like documents have no source_url
+        documents = [b"<title>T</title>", bytearray(b"<title>U</title>"), memoryview(b"<title>V</title>")]
+        for workers in (0, 2):
+            self.assertEqual([x.title for x in self.extractor.extract_many(documents, workers=workers)], ["T", "U", "V"])
+
+    def test_async_extractor(self):
+        "AsyncExtractor should extract on an executor with bounded concurrency."
+        async def pages():
+            for html in (LETHAIN_COM_HTML, FACEBOOK_HTML, TWITTER_HTML):
+                yield html, None
+
+        async def run():
+            async with AsyncExtractor(max_in_flight=2) as async_extractor:
+                extracted = await async_extractor.extract(FACEBOOK_HTML)
+                self.assertEqual(extracted.title, "The Rock")
+                results = [x async for x in async_extractor.extract_many(pages())]
+                self.assertEqual([x.title for x in results],
+                                 [self.extractor.extract(x).title for x in (LETHAIN_COM_HTML, FACEBOOK_HTML, TWITTER_HTML)])
+
+                utf16 = "<title>caf\xe9</title>".encode("utf-16-le")
+                documents = [(utf16, None, "text/html; charset=utf-16-le"), bytearray(b"<title>U</title>"),
+                             memoryview(b"<title>V</title>")]
+                results = [x async for x in async_extractor.extract_many(documents)]
+                self.assertEqual([x.title for x in results], ["caf\xe9", "U", "V"])
+        asyncio.run(run())
+
+    def test_async_extractor_timeouts(self):
+        "AsyncExtractor should time out slow documents and limit documents in flight."
+        slow = extraction.Extractor(techniques=["extraction.tests.tests.SlowTechnique"])
+
+        async def run():
+            async with AsyncExtractor(slow, max_workers=4, max_in_flight=2) as async_extractor:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await async_extractor.extract("a", timeout=0.01)
+
+                start = time.time()
+                results = [x async for x in async_extractor.extract_many(["b", "c", "d", "e"])]
+                self.assertEqual([x.title for x in results], ["b", "c", "d", "e"])
+                # two at a time, despite four worker threads
+                self.assertTrue(time.time() - start >= 2 * SlowTechnique.delay)
+        asyncio.run(run())
+
+    def test_lru_cache(self):
+        "Cached results should be reused for identical documents and configuration."
+        self.extractor.cache = LRUCache(maxsize=2)
+        first = self.extractor.extract(LETHAIN_COM_HTML)
+        first.titles.append("mutating results shouldn't affect the cache")
+        second = self.extractor.extract(LETHAIN_COM_HTML)
+        self.assertEqual(second.titles, self.extractor.extract(LETHAIN_COM_HTML).titles)
+        self.assertEqual((self.extractor.cache.hits, self.extractor.cache.misses), (2, 1))
+
+        # source_url and techniques are part of the key
+        self.extractor.extract(LETHAIN_COM_HTML, source_url="http://lethain.com/")
+        self.extractor.techniques = ["extraction.techniques.HeadTags"]
+        self.extractor.extract(LETHAIN_COM_HTML, source_url="http://lethain.com/")
+        self.assertEqual(self.extractor.cache.misses, 3)
+        self.assertEqual(len(self.extractor.cache), 2)
+
+        expiring = LRUCache(ttl=-1)
+        expiring.set("key", {})
+        self.assertEqual(expiring.get("key"), None)
+
+    def test_sqlite_cache(self):
+        "Results cached in SQLite should survive the extractor being recreated."
+        path = os.path.join(tempfile.mkdtemp(), "cache.db")
+        extractor = extraction.Extractor(cache=SqliteCache(path))
+        expected = extractor.extract(FACEBOOK_HTML).titles
+        extractor.cache.close()
+
+        extractor = extraction.Extractor(cache=SqliteCache(path))
+        self.assertEqual(extractor.extract(FACEBOOK_HTML).titles, expected)
+        self.assertEqual((extractor.cache.hits, extractor.cache.misses), (1, 0))
+        extractor.cache.close()
+
+    def test_frozen_extractor_shared_by_threads(self):
+        "One frozen extractor should give the same results when hammered from many threads."
+        extractor = extraction.Extractor(cache=LRUCache(maxsize=8), instrument=StatsSink()).freeze()
+        pages = [getattr(data, x) for x in sorted(dir(data)) if x.endswith("_HTML")]
+        calls = [(page, source_url, fields) for page in pages
+                 for source_url in (None, "http://lethain.com/digg-v4/")
+                 for fields in (None, ["titles", "feeds"])]
+        expected = dict((index, extraction.DictExtractor().extract(*call[:2], fields=call[2]))
+                        for index, call in enumerate(calls))
+
+        def extract(index):
+            page, source_url, fields = calls[index % len(calls)]
+            extracted = extractor.extract(page, source_url=source_url, fields=fields)
+            return index % len(calls), extracted
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            for index, extracted in executor.map(extract, range(len(calls) * 20)):
+                self.assertEqual((extracted.titles, extracted.descriptions, extracted.images, extracted.urls,
+                                  extracted.feeds, extracted.videos),
+                                 tuple(expected[index].get(x, []) for x in ("titles", "descriptions", "images",
+                                                                             "urls", "feeds", "videos")))
+        self.assertEqual(extractor.cache.hits + extractor.cache.misses, len(calls) * 20)
+        self.assertEqual(len(extractor.cache), 8)
+
+        def reassign():
+            extractor.techniques = ["extraction.techniques.HeadTags"]
+        self.assertRaises(AttributeError, reassign)
+        self.assertTrue(isinstance(extractor.techniques, tuple))
+        self.assertTrue(extractor.freeze() is extractor)
+        unpickled = pickle.loads(pickle.dumps(extractor))
+        self.assertRaises(AttributeError, setattr, unpickled, "strict_types", True)
+        self.assertEqual(unpickled.extract(FACEBOOK_HTML).titles, extraction.Extractor().extract(FACEBOOK_HTML).titles)
+
+    def test_service(self):
+        "The service should extract pages sent over HTTP, singly, in batches and pipelined."
+        pages = [(FACEBOOK_HTML, None), (LETHAIN_COM_HTML, "http://lethain.com/digg-v4/"), (TWITTER_HTML, None)]
+        expected = [extraction.Extractor().extract(html, source_url=url).as_dict() for html, url in pages]
+        with ExtractionService(workers=1, chunksize=2, max_pending=4) as service:
+            server = make_server(service, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            connection = http.client.HTTPConnection(*server.server_address[:2])
+            connection.request("POST", "/extract?url=http%3A%2F%2Flethain.com%2Fdigg-v4%2F",
+                               body=LETHAIN_COM_HTML.encode('utf-8'), headers={"Content-Type": "text/html; charset=utf-8"})
+            response = connection.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.loads(response.read()), {"source_url": pages[1][1], "extracted": expected[1]})
+
+            batch = "".join(json.dumps({"html": html, "url": url}) + "\n" for html, url in pages)
+            connection.request("POST", "/batch", body=batch.encode('utf-8'))
+            lines = [json.loads(x) for x in connection.getresponse().read().splitlines()]
+            self.assertEqual([x["extracted"] for x in lines], expected)
+            self.assertEqual([x["id"] for x in lines], [1, 2, 3])
+
+            connection.request("POST", "/batch", body=b"not json")
+            response = connection.getresponse()
+            self.assertEqual((response.status, "error" in json.loads(response.read())), (400, True))
+            connection.request("POST", "/batch", body=(batch * 2).encode('utf-8'))
+            response = connection.getresponse()
+            self.assertEqual((response.status, "error" in json.loads(response.read())), (503, True))
+            connection.request("GET", "/stats")
+            stats = json.loads(connection.getresponse().read())
+            self.assertEqual((stats["extracted"], stats["pending"]), (4, 0))
+            self.assertEqual(stats["requests"], {"200": 2, "400": 1, "503": 1})
+            self.assertEqual(stats["latency_seconds"]["batch"]["count"], 3)
+            connection.close()
+            server.shutdown()
+            server.server_close()
+
+        path = os.path.join(tempfile.mkdtemp(), "extraction.sock")
+        with ExtractionService(extraction.Extractor().freeze(), workers=2, executor="thread") as service:
+            server = make_server(service, socket_path=path)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(path)
+            requests = b"".join(b"POST /extract HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(x), x)
+                                for x in (FACEBOOK_HTML.encode('utf-8'), TWITTER_HTML.encode('utf-8')))
+            client.sendall(requests)
+            fin = client.makefile('rb')
+            for page in (expected[0], expected[2]):
+                status, headers, body = read_response(fin)
+                self.assertEqual(status, 200)
+                self.assertEqual(json.loads(body)["extracted"], page)
+            client.close()
+            server.shutdown()
+            server.server_close()
+        self.assertFalse(os.path.exists(path))
+
+        # a page which fails gets an error, without failing the rest of its batch
+        picky = extraction.Extractor(techniques=["extraction.techniques.HeadTags", "extraction.tests.tests.PickyTechnique"])
+        with ExtractionService(picky, workers=1, executor="thread") as service:
+            server = make_server(service, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            connection = http.client.HTTPConnection(*server.server_address[:2])
+            batch = "".join(json.dumps({"id": x, "html": "<title>%s</title>" % x}) + "\n" for x in ("fine", "picky"))
+            connection.request("POST", "/batch", body=batch.encode('utf-8'))
+            response = connection.getresponse()
+            lines = [json.loads(x) for x in response.read().splitlines()]
+            self.assertEqual(response.status, 200)
+            self.assertEqual(lines, [{"id": "fine", "source_url": None, "extracted": {"titles": ["fine"]}},
+                                     {"id": "picky", "source_url": None, "error": "ValueError: too picky"}])
+            connection.request("POST", "/extract", body=b"<title>picky</title>")
+            response = connection.getresponse()
+            self.assertEqual((response.status, json.loads(response.read())["error"]), (500, "extraction failed: too picky"))
+            self.assertEqual((service.stats()["extracted"], service.stats()["failed"]), (1, 2))
+            connection.close()
+            server.shutdown()
+            server.server_close()
+
+    def test_add_unique(self):
+        "Deduplication should preserve order, including for unhashable values."
+        values = ["a"]
+        seen = set(values)
+        extraction.add_unique(values, seen, ["b", "a", "c", "b"])
+        self.assertEqual(values, ["a", "b", "c"])
+        extraction.add_unique(values, seen, [{"x": 1}, "c", {"x": 1}, {"x": 2}])
+        self.assertEqual(values, ["a", "b", "c", {"x": 1}, {"x": 2}])
+
+    def test_collect_text(self):
+        "Text should be normalized in one pass, and only read up to the maximum description length."
+        strings = ["  Digg v4's\n", "", "Architecture\t", "\xa0Process "]
+        self.assertEqual(collect_text(strings), "Digg v4's Architecture Process")
+        self.assertEqual(type(collect_text(strings)), NormalizedText)
+        self.assertEqual(collect_text(iter(strings), max_length=22), "Digg v4's Architecture")
+        self.assertEqual(collect_text(iter(strings), max_length=10), "Digg v4's")
+        # whitespace is kept, as cleanup turns it into an empty description
+        self.assertEqual((collect_text([" \n"]), collect_text(["", ""]), collect_text([""])), (" ", " ", ""))
+        self.assertEqual(collect_text(iter(["", ""]), max_length=5), " ")
+
+        def strings():
+            yield "A long paragraph which goes on."
+            raise AssertionError("read past the maximum description length")
+        self.assertEqual(collect_text(strings(), max_length=6), "A long")
+
+        html = "<p>%s</p><p>Short.</p><meta name=description content='%s'>" % ("word " * 1000, "meta " * 10)
+        extracted = extraction.Extractor().extract(html)
+        limited = extraction.Extractor(max_description_length=12).extract(html)
+        self.assertEqual([len(x) for x in extracted.descriptions], [49, 4999, 6])
+        self.assertEqual(limited.descriptions, ["meta meta", "word word", "Short."])
+
+    def test_compact_extracted(self):
+        "Extracted should store values compactly, and only build lists when asked."
+        extracted = extraction.Extracted(titles=["a", "b"], images=("c",), tags=["d"])
+        self.assertFalse(hasattr(extracted, '__dict__'))
+        self.assertEqual(type(extracted._titles), tuple)
+        self.assertEqual((extracted.title, extracted.image, extracted.url), ("a", "c", None))
+        self.assertEqual(type(extracted._titles), tuple)
+
+        extracted.titles.append("e")
+        self.assertEqual(extracted.titles, ["a", "b", "e"])
+        self.assertEqual(extracted.feeds, [])
+        self.assertEqual(extracted._unexpected_values, {'tags': ["d"]})
+
+        unpickled = pickle.loads(pickle.dumps(extracted))
+        self.assertEqual((unpickled.titles, unpickled.images), (["a", "b", "e"], ["c"]))
+
+    def test_best_only(self):
+        "best_only should stop running techniques once each data type has a value."
+        self.extractor.techniques = ["extraction.techniques.FacebookOpengraphTags",
+                                     "extraction.tests.tests.RecordingTechnique"]
+        del RecordingTechnique.parsed[:]
+        extracted = self.extractor.extract(FACEBOOK_HTML, best_only=["titles", "images"])
+        self.assertEqual((extracted.title, extracted.image), ("The Rock", "http://ia.media-imdb.com/rock.jpg"))
+        self.assertEqual(RecordingTechnique.parsed, [])
+
+        # keep going while a data type is missing
+        self.extractor.extract(FACEBOOK_HTML, best_only=["titles", "feeds"])
+        self.assertEqual(len(RecordingTechnique.parsed), 1)
+
+        self.extractor.techniques = extraction.Extractor.techniques
+        best = self.extractor.extract(LETHAIN_COM_HTML, best_only=["titles", "descriptions", "images"])
+        full = self.extractor.extract(LETHAIN_COM_HTML)
+        self.assertEqual((best.title, best.description, best.image), (full.title, full.description, full.image))
+
+    def test_fields(self):
+        "Only requested fields should be extracted, skipping techniques which can't produce them."
+        extracted = self.extractor.extract(LETHAIN_COM_HTML, fields=["titles", "images"])
+        full = self.extractor.extract(LETHAIN_COM_HTML)
+        self.assertEqual((extracted.titles, extracted.images), (full.titles, full.images))
+        self.assertEqual((extracted.descriptions, extracted.feeds, extracted.urls), ([], [], []))
+        self.assertEqual(extracted._unexpected_values, {})
+
+        # only HeadTags can produce feeds, so nothing else is run or searched
+        doc = Document(LETHAIN_COM_HTML, tags=['link'], fields=frozenset(["feeds"]))
+        self.assertEqual(self.extractor.extract(doc, fields=["feeds"]).feeds, ["/feeds/"])
+        self.assertEqual(sorted(doc._elements), ['link'])
+
+        # techniques which don't declare their fields always run
+        self.extractor.techniques = ["extraction.examples.custom_technique.LethainComTechnique"]
+        self.assertEqual(self.extractor.extract(LETHAIN_COM_HTML, fields=["dates"])._unexpected_values,
+                         {'dates': ['08/19/2012']})
+
+    def test_sniff_charset(self):
+        "Charsets should be sniffed from BOMs, Content-Type headers and meta tags, in that order."
+        latin = u'<meta charset="iso-8859-1"><title>Caf\xe9</title>'.encode('latin-1')
+        self.assertEqual(sniff_charset(latin), ('iso8859-1', 0))
+        self.assertEqual(sniff_charset(latin, content_type="text/html; charset=UTF-8"), ('utf-8', 0))
+        self.assertEqual(sniff_charset(b'\xef\xbb\xbf' + latin, content_type="text/html; charset=ascii"), ('utf-8', 3))
+        self.assertEqual(sniff_charset(b'<meta http-equiv="Content-Type" content="text/html; charset=windows-1251">'),
+                         ('cp1251', 0))
+        self.assertEqual(sniff_charset(b'<title>Hi</title>'), (None, 0))
+
+        self.assertEqual(decode(latin), u'<meta charset="iso-8859-1"><title>Caf\xe9</title>')
+        # undeclared documents fall back to windows-1252 if they aren't UTF-8
+        self.assertEqual(decode(u'<title>Caf\xe9</title>'.encode('utf-8')), u'<title>Caf\xe9</title>')
+        self.assertEqual(decode(u'<title>Caf\xe9</title>'.encode('cp1252')), u'<title>Caf\xe9</title>')
+        self.assertEqual(decode(memoryview(LETHAIN_COM_HTML.encode('utf-8')), head_only=True),
+                         LETHAIN_COM_HTML[:LETHAIN_COM_HTML.index('</head>')])
+
+    def test_untrusted_charsets(self):
+        "Charsets naming codecs which can't decode documents should be ignored."
+        page = u'<title>Caf\xe9</title>'.encode('utf-8')
+        for charset in ("hex", "base64", "rot13", "zlib", "idna", "undefined", "utf-32"):
+            self.assertEqual(sniff_charset(b'<meta charset="%s">' % charset.encode('ascii') + page), (None, 0))
+            self.assertEqual(sniff_charset(page, content_type="text/html; charset=" + charset), (None, 0))
+            for streaming in (False, True):
+                extractor = extraction.Extractor(streaming=streaming, techniques=["extraction.techniques.HeadTags"])
+                self.assertEqual(extractor.extract(b'<meta charset="%s">' % charset.encode('ascii') + page).title,
+                                 u"Caf\xe9")
+                self.assertEqual(extractor.extract(page, content_type="text/html; charset=" + charset).title,
+                                 u"Caf\xe9")
+
+        utf16 = u'<title>Caf\xe9</title>'.encode('utf-16-le')
+        self.assertEqual(sniff_charset(utf16, content_type="text/html; charset=UTF-16"), ('utf-16-le', 0))
+        self.assertEqual(decode(utf16, content_type="text/html; charset=UTF-16", head_only=True),
+                         u'<title>Caf\xe9</title>')
+
+    def test_extract_bytes(self):
+        "Extractors should accept the raw bytes of documents."
+        encoded = LETHAIN_COM_HTML.encode('utf-16')
+        extracted = self.extractor.extract(encoded)
+        self.assertEqual(extracted.titles, self.extractor.extract(LETHAIN_COM_HTML).titles)
+
+        head_techniques = ["extraction.techniques.HeadTags"]
+        streaming = extraction.Extractor(techniques=head_techniques, streaming=True)
+        extracted = streaming.extract(memoryview(FACEBOOK_HTML.encode('cp1252')), content_type="text/html; charset=cp1252")
+        self.assertEqual(extracted.descriptions, extraction.Extractor(techniques=head_techniques).extract(FACEBOOK_HTML).descriptions)
+
+    def test_extract_archive(self):
+        "HTML pages in WARC archives should be extracted from the memory-mapped file."
+        http = "application/http; msgtype=response"
+        chunked = b"10\r\n" + FACEBOOK_HTML[:16].encode('utf-8') + b"\r\n" + \
+            ("%x\r\n" % len(FACEBOOK_HTML[16:])).encode('utf-8') + FACEBOOK_HTML[16:].encode('utf-8') + b"\r\n0\r\n\r\n"
+        records = [warc_record("warcinfo", "", b"software: tests\r\n", "application/warc-fields", "<urn:1>"),
+                   warc_record("response", "http://lethain.com/digg-v4-architecture-process/",
+                               http_response(LETHAIN_COM_HTML.encode('utf-8'), "text/html; charset=utf-8"), http, "<urn:2>"),
+                   warc_record("response", "http://lethain.com/logo.png", http_response(b"\x89PNG", "image/png"), http, "<urn:3>"),
+                   warc_record("response", "http://www.imdb.com/title/tt0117500/",
+                               http_response(chunked, "text/html", "Transfer-Encoding: chunked\r\n"), http, "<urn:4>"),
+                   warc_record("resource", "http://nytimes.com/", TWITTER_HTML.encode('utf-8'), "text/html", "<urn:5>")]
+        path = os.path.join(tempfile.mkdtemp(), "crawl.warc")
+        with open(path, 'wb') as fout:
+            fout.write(b"".join(records))
+
+        extracted = list(self.extractor.extract_archive(path))
+        self.assertEqual([x[0] for x in extracted], ["<urn:2>", "<urn:4>", "<urn:5>"])
+        self.assertEqual(extracted[0][1].images[0], "http://lethain.com/static/blog/digg_v4/initial_org.png")
+        self.assertEqual(extracted[1][1].title, "The Rock")
+        self.assertEqual(extracted[2][1].title, "Parade of Fans for Houston's Funeral")
+
+    def test_malformed_archive(self):
+        "Records without a valid Content-Length, or with a corrupt body, should be skipped without ending the archive."
+        page = warc_record("resource", "http://example.com/", b"<title>fine</title>", "text/html", "<urn:2>")
+        fake = b"WARC/1.0\r\nWARC-Type: resource\r\nContent-Type: text/html\r\nContent-Length: 20\r\n" \
+               b"<title>payload</title>"
+        missing = page.replace(b"Content-Length: 19\r\n", b"").replace(b"<urn:2>", b"<urn:1>")
+        missing = missing.replace(b"<title>fine</title>", fake)
+        malformed = page.replace(b"Content-Length: 19", b"Content-Length: 1x").replace(b"<urn:2>", b"<urn:3>")
+        truncated = page.replace(b"Content-Length: 19", b"Content-Length: 99").replace(b"<urn:2>", b"<urn:4>")
+        path = os.path.join(tempfile.mkdtemp(), "crawl.warc")
+        with open(path, 'wb') as fout:
+            fout.write(missing + page + malformed + page + truncated)
+
+        records = [(headers["warc-record-id"], bytes(payload)) for headers, payload in iter_records(path)]
+        self.assertEqual(records, [("<urn:2>", b"<title>fine</title>")] * 2)
+        extracted = list(self.extractor.extract_archive(path))
+        self.assertEqual([(x[0], x[1].title) for x in extracted], [("<urn:2>", "fine")] * 2)
+
+        # responses which can't be decoded are skipped, or reported
+        with open(path, 'wb') as fout:
+            fout.write(page + corrupt_responses("http://example.com/") + page)
+        extracted = list(self.extractor.extract_archive(path))
+        self.assertEqual([(x[0], x[1].title) for x in extracted], [("<urn:2>", "fine")] * 2)
+        errors = []
+        pages = [bytes(x[2]) for x in iter_pages(path, errors=lambda *args: errors.append(args))]
+        self.assertEqual(pages, [b"<title>fine</title>"] * 2)
+        self.assertEqual([(x[0], type(x[1])) for x in errors], [("<urn:gzip>", gzip.BadGzipFile), ("<urn:chunked>", ValueError)])
+
+    def test_command_line(self):
+        "The command line extractor should write a JSON line per page."
+        directory = tempfile.mkdtemp()
+        for name, html in (("facebook.html", FACEBOOK_HTML), ("twitter.html", TWITTER_HTML)):
+            with open(os.path.join(directory, name), 'w') as fout:
+                fout.write(html)
+        stdin = io.StringIO(json.dumps({"id": "lethain", "html": LETHAIN_COM_HTML,
+                                        "url": "http://lethain.com/digg-v4-architecture-process/"}) + "\n")
+        stdout, stderr = io.StringIO(), io.StringIO()
+        cli.main([directory, "-", "--workers", "0", "-t", "extraction.techniques.HeadTags",
+                  "-t", "extraction.techniques.FacebookOpengraphTags"], stdin=stdin, stdout=stdout, stderr=stderr)
+
+        lines = [json.loads(x) for x in stdout.getvalue().splitlines()]
+        self.assertEqual([x["id"] for x in lines], [os.path.join(directory, "facebook.html"),
+                                                   os.path.join(directory, "twitter.html"), "lethain"])
+        self.assertEqual(lines[0]["extracted"]["titles"], ["The Rock"])
+        self.assertEqual(lines[2]["source_url"], "http://lethain.com/digg-v4-architecture-process/")
+        self.assertEqual(lines[2]["extracted"]["feeds"], ["http://lethain.com/feeds/"])
+        self.assertTrue("extracted 3 pages" in stderr.getvalue())
+
+    def test_command_line_errors(self):
+        "The command line extractor should report pages it can't read or extract, and carry on."
+        path = os.path.join(tempfile.mkdtemp(), "crawl.warc")
+        utf16 = "<title>caf\xe9</title>".encode("utf-16-le")
+        with open(path, 'wb') as fout:
+            fout.write(warc_record("resource", "http://example.com/", utf16, "text/html; charset=utf-16-le", "<urn:1>"))
+            fout.write(corrupt_responses("http://example.com/corrupt"))
+        missing = os.path.join(os.path.dirname(path), "missing.html")
+        stdin = io.StringIO("\n".join(['{"id": "first", "html": "<title>first</title>"}', '{"html": "',
+                                       '{"id": "picky", "html": "<title>picky</title>"}', '["html"]',
+                                       '{"id": "last", "html": "<title>last</title>"}']))
+        for workers in ("0", "2"):
+            stdin.seek(0)
+            stdout, stderr = io.StringIO(), io.StringIO()
+            status = cli.main([path, missing, "-", "--workers", workers, "-t", "extraction.techniques.HeadTags",
+                               "-t", "extraction.tests.tests.PickyTechnique"], stdin=stdin, stdout=stdout, stderr=stderr)
+            self.assertEqual(status, 1)
+
+            lines = [json.loads(x) for x in stdout.getvalue().splitlines()]
+            self.assertEqual([x["id"] for x in lines], ["<urn:1>", "<urn:gzip>", "<urn:chunked>", missing,
+                                                       "first", 2, "picky", 4, "last"])
+            self.assertEqual(lines[0]["extracted"]["titles"], ["caf\xe9"])
+            self.assertEqual([x["extracted"]["titles"] for x in (lines[4], lines[8])], [["first"], ["last"]])
+            self.assertEqual(lines[3]["error"].split(":")[0], "FileNotFoundError")
+            self.assertEqual(lines[6]["error"], "ValueError: too picky")
+            for line in lines[1:4] + lines[5:8]:
+                self.assertFalse("extracted" in line)
+                self.assertTrue("failed to extract %s: %s" % (line["id"], line["error"]) in stderr.getvalue())
+            self.assertTrue("extracted 9 pages" in stderr.getvalue() and "6 failed" in stderr.getvalue())
+
+    def test_instrumentation(self):
+        "Instrumented extractors should report timings and counts per technique."
+        stats = StatsSink()
+        extractor = extraction.Extractor(instrument=stats)
+        instrumented = extractor.extract(LETHAIN_COM_HTML)
+        self.assertEqual(extraction.Extractor().extract(LETHAIN_COM_HTML).titles, instrumented.titles)
+
+        summary = stats.summary()
+        self.assertEqual(summary[('parse_seconds', None)]['count'], 1)
+        self.assertEqual(summary[('document_bytes', None)]['total'], len(LETHAIN_COM_HTML))
+        for technique in extractor.techniques:
+            self.assertEqual(summary[('technique_seconds', technique)]['count'], 1)
+            self.assertTrue(summary[('candidates', technique)]['total'] >= summary[('kept', technique)]['total'])
+        self.assertEqual(sum(summary[('kept', x)]['total'] for x in extractor.techniques),
+                         sum(len(x) for x in extractor.run_techniques(LETHAIN_COM_HTML).values()))
+
+        recorded = []
+        extractor.instrument = CallbackSink(lambda *args: recorded.append(args))
+        extractor.extract(FACEBOOK_HTML)
+        self.assertTrue(('candidates', 4, 'extraction.techniques.FacebookOpengraphTags') in recorded)
+
+    def test_benchmark_suite(self):
+        "The benchmark suite should measure a generated corpus and catch regressions."
+        self.assertEqual(corpus.generate(4, seed=1), corpus.generate(4, seed=1))
+        results = suite.run(parsers=["html.parser"], techniques=[suite.ALL_TECHNIQUES],
+                            pages=4, isolate=False)
+        result = results['results'][0]
+        self.assertEqual((result['parser'], result['technique'], result['pages']), ("html.parser", "all", 4))
+        self.assertTrue(result['pages_per_second'] > 0 and result['p50_ms'] <= result['p99_ms'])
+        self.assertEqual(json.loads(json.dumps(results)), results)
+
+        self.assertEqual(suite.compare(results, results), [])
+        slower = json.loads(json.dumps(results))
+        slower['results'][0]['pages_per_second'] /= 2
+        self.assertEqual([x['metric'] for x in suite.compare(results, slower)], ['pages_per_second'])
+
+    def test_resource_limits(self):
+        "Documents over the extractor's limits should be truncated and flagged."
+        body = "<p>filler</p>" * 10000
+        html = LETHAIN_COM_HTML.replace("</body>", body + "</body>")
+        full = self.extractor.extract(html)
+        self.assertEqual(full.truncated, [])
+        for kwargs, reason in (({'max_bytes': len(LETHAIN_COM_HTML)}, "bytes"), ({'max_nodes': 2000}, "nodes")):
+            extracted = extraction.Extractor(**kwargs).extract(html)
+            self.assertEqual(extracted.truncated, [reason])
+            self.assertEqual(extracted.title, full.title)
+            self.assertEqual(extracted.feeds, full.feeds)
+        extracted = extraction.DictExtractor(max_bytes=len(LETHAIN_COM_HTML)).extract(html.encode('utf-8'))
+        self.assertEqual(extracted['truncated'], ["bytes"])
+
+        # strings are measured in UTF-8, and cut where the head ends if it fits
+        html = "<html><head><title>caf\xe9</title></head><body>" + "<p>\xe9t\xe9</p>" * 100
+        self.assertTrue(limits.exceeds_bytes(html, len(html)))
+        self.assertEqual(limits.truncate_bytes(html, 100), "<html><head><title>caf\xe9</title>")
+        self.assertEqual(bytes(limits.truncate_bytes(html.encode('utf-8'), 100)), b"<html><head><title>caf\xc3\xa9</title>")
+        self.assertEqual(limits.truncate_bytes(html, 24), "<html><head><title>caf\xe9")
+        self.assertEqual(limits.truncate_bytes(html, 23), "<html><head>")
+        self.assertEqual(limits.truncate_bytes("\xe9" * 10, 5), "\xe9\xe9")
+        self.assertEqual(limits.truncate_bytes(html, len(html.encode('utf-8'))), None)
+
+        # a tracking pixel in the head doesn't end it
+        html = PIXEL_HTML.replace("<p>hi</p>", "<p>filler</p>" * 1000)
+        self.assertEqual(limits.truncate_bytes(html, 4096), PIXEL_HTML[:find_head_end(PIXEL_HTML)])
+        extracted = extraction.DictExtractor(max_bytes=4096).extract(html)
+        self.assertEqual((extracted['titles'], extracted['urls'], extracted['truncated']),
+                         (['OG', 'T'], ['http://example.com/c'], ['bytes']))
+
+        techniques = ["extraction.tests.tests.SlowTechnique", "extraction.techniques.HeadTags"]
+        extractor = extraction.Extractor(techniques=techniques, technique_timeout=0.05, cache=LRUCache())
+        extracted = extractor.extract(LETHAIN_COM_HTML)
+        self.assertEqual(extracted.truncated, ["timeout"])
+        self.assertEqual(extracted.feeds, [])
+        self.assertEqual(len(extractor.cache), 0)
+        extractor.technique_timeout = 1.0
+        self.assertEqual(extractor.extract(LETHAIN_COM_HTML).feeds, ["/feeds/"])
+
+    def test_url_normalizer(self):
+        "Batched URL normalization should match cleaning up each URL on its own."
+        extractor = extraction.DictExtractor()
+        values = ["", ".", "../", "/feeds/", "logo.png", "a/./b/../c", "../../../x", "?q", "#top", "g;x?y#s",
+                  "//cdn.example.com/a.png", "http://example.com", "http:///x", "HTTP://Example.com/", " /x",
+                  "mailto:me@example.com", "data:image/png;base64,AAA", "//", "caf\xe9/\xfc.png", "logo.png"]
+        for source_url in (None, "", "http://lethain.com", "http://lethain.com/digg-v4/", "https://a.com/b/c?q=1#f",
+                           "http://a.com/b;p?q", "ftp://a.com/x/", "a.com/b/", "//a.com/x"):
+            normalizer = URLNormalizer(source_url)
+            expected = [extractor.cleanup_url(x, source_url, False) for x in values]
+            self.assertEqual(normalizer.normalize_all(values), expected)
+            self.assertEqual(normalizer.normalize_all(values), expected)
+
+        class MarkingExtractor(extraction.DictExtractor):
+            def cleanup_url(self, value_url, source_url, mark):
+                return "marked:" + value_url
+        cleaned = MarkingExtractor().cleanup({'images': ["a.png"]}, source_url="http://lethain.com/")
+        self.assertEqual(cleaned['images'], ["marked:a.png"])
+
+    def test_selector_techniques(self):
+        "Declarative techniques should be compiled together and resolved in one pass."
+        techniques = ["extraction.techniques.FacebookOpengraphTags", "extraction.tests.tests.KeywordTags",
+                      "extraction.techniques.HeadTags"]
+        extractor = extraction.DictExtractor(techniques=techniques)
+        self.assertEqual(sorted(extractor._resolved.selectors.index), ['link', 'meta'])
+        self.assertEqual(sorted(extractor._resolved.selectors.index['meta']), ['name', 'property'])
+
+        doc = Document(LETHAIN_COM_HTML, tags=extractor.technique_tags(), selectors=extractor._resolved.selectors)
+        extracted = extractor.extract(doc)
+        self.assertEqual(list(doc._selected), [extractor._resolved.selectors])
+        self.assertEqual(extracted['keywords'], ["Blog Will Larson Programming Life"])
+        self.assertEqual(extracted['urls'], ["http://lethain.com/digg-v4-architecture-process/"])
+        self.assertEqual(extracted['descriptions'], self.extractor.extract(LETHAIN_COM_HTML).descriptions[:1])
+
+        # techniques used on their own compile an index of their own
+        self.assertEqual(KeywordTags().extract(LETHAIN_COM_HTML)['keywords'], extracted['keywords'])
+
+    def test_extract_incremental(self):
+        "Only techniques affected by changed regions of a page should run again."
+        html = LETHAIN_COM_HTML.replace("</body>", '<div class="ad">1 comment</div></body>')
+        stats = StatsSink()
+        extractor = extraction.Extractor(instrument=stats)
+        extracted, fingerprint = extractor.extract_incremental(html, source_url="http://lethain.com/")
+        self.assertEqual(extracted.titles, extractor.extract(html, source_url="http://lethain.com/").titles)
+
+        def runs():
+            summary = stats.summary()
+            return dict((x, summary[('technique_seconds', x)]['count']) for x in extractor.techniques)
+
+        before = runs()
+        changed = html.replace("1 comment", "2 comments")
+        extracted, fingerprint = extractor.extract_incremental(changed, fingerprint, source_url="http://lethain.com/")
+        self.assertEqual(runs(), before)
+        self.assertEqual(extracted.descriptions, extractor.extract(changed, source_url="http://lethain.com/").descriptions)
+
+        before = runs()
+        changed = changed.replace("<title>", "<title>Updated: ")
+        extracted, fingerprint = extractor.extract_incremental(changed, fingerprint.from_dict(fingerprint.as_dict()),
+                                                               source_url="http://lethain.com/")
+        self.assertTrue(extracted.title.startswith("Updated: "))
+        rerun = [x for x in extractor.techniques if runs()[x] > before[x]]
+        self.assertTrue("extraction.techniques.HeadTags" in rerun)
+        self.assertFalse("extraction.techniques.SemanticTags" in rerun)
+
+        # results for another source url can't be reused
+        extracted, _ = extractor.extract_incremental(changed, fingerprint, source_url="http://example.com/")
+        self.assertEqual(extracted.feeds, ["http://example.com/feeds/"])
+
+    def test_extract_incremental_malformed(self):
+        "Incremental extraction of edited, misnested pages should match extracting them in full."
+        url = "http://lethain.com/"
+        base = ("<html><body><div><span><section><p>intro</p><article></span><video><source src=v.mp4></video>"
+                "<h1>h</h1></article></section></div></body></html>")
+        edits = [(base, base.replace("<h1>h</h1>", "<section>")),
+                 (base, base.replace("<p>intro</p>", "<p>intro</p></p>")),
+                 (HTML5_HTML, HTML5_HTML.replace("<p>", "</p><p>", 1)),
+                 (LETHAIN_COM_HTML, LETHAIN_COM_HTML.replace("<h1", "<select><option>o<h1", 1)),
+                 (LETHAIN_COM_HTML, LETHAIN_COM_HTML.replace("</head>", "</head><title>", 1)),
+                 (WILLARSON_COM_HTML, WILLARSON_COM_HTML.replace("<p>", "<p><image src=new.png>", 1)),
+                 (LETHAIN_COM_HTML, LETHAIN_COM_HTML.replace("<p>", "<li><p>", 2))]
+        extractor = extraction.DictExtractor()
+        for old, new in edits:
+            _, fingerprint = extractor.extract_incremental(old, source_url=url)
+            self.assertEqual(extractor.extract_incremental(new, fingerprint, source_url=url)[0],
+                             extractor.extract(new, source_url=url))
+
+        # well nested pages are still split into regions
+        self.assertTrue(all(tags is not None for _, tags in incremental.regions(LETHAIN_COM_HTML)))
+        self.assertEqual(incremental.regions(edits[0][1])[1][1], None)
+
+    def test_scanner_matches_parser(self):
+        "Scanning for head tags should give the same results as parsing, or fall back to parsing."
+        techniques = ["extraction.techniques.FacebookOpengraphTags", "extraction.techniques.TwitterSummaryCardTags",
+                      "extraction.techniques.HeadTags"]
+        tricky = ['<title>a&ampb&amp;c&notit;</title><meta name=description content="&copy=1&amp=2&notin;&#x80;">',
+                  '<!-- <meta name=description content=hidden> --><meta name="description" content=\'x y\'>',
+                  '<script>var s = "<meta name=description content=no>";</script><meta property=og:title content=T>',
+                  '<noscript><meta name=author content=ns></noscript><select><meta name=author content=e></select>',
+                  '<textarea><meta name=description content=ta></textarea><META NAME="Description" CONTENT="Up">',
+                  '<div data-x="<meta name=description content=attr>"></div><link rel="canonical" href=/c/>',
+                  '<svg><title>icon</title></svg><title>Real</title>', '<title>unterminated']
+        pages = [getattr(data, x) for x in dir(data) if x.endswith("_HTML")] + tricky
+        for streaming in (False, True):
+            parsed = extraction.DictExtractor(techniques=techniques, streaming=streaming)
+            scanned = extraction.DictExtractor(techniques=techniques, streaming=streaming, scan=True)
+            for page in pages:
+                self.assertEqual(scanned.extract(page), parsed.extract(page))
+
+        doc = Document(FACEBOOK_HTML, tags=scanned.technique_tags(), scan=True)
+        self.assertEqual(scanned.extract(doc)['titles'], ["The Rock"])
+        self.assertEqual(doc._soup, None)
+        doc = Document(tricky[-2], tags=scanned.technique_tags(), scan=True)
+        self.assertEqual(scanned.extract(doc)['titles'], ["icon"])
+        self.assertNotEqual(doc._soup, None)
+
+
 if __name__ == '__main__':
     unittest.main()
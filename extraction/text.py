@@ -0,0 +1,67 @@
+"""
+Collecting the text of an element in one pass over its text nodes.
+
+Joining every text node of a paragraph into one string, only for
+cleanup to split it into words and join them again, copies long
+paragraphs several times. ``collect_text`` gathers the words of each
+text node as it goes, and can stop once it has enough of them::
+
+    >>> from extraction.text import collect_text
+    >>> collect_text(["  Digg v4's\\n", "Architecture ", " Process"])
+    "Digg v4's Architecture Process"
+    >>> collect_text(["Digg v4's Architecture Process"], max_length=16)
+    "Digg v4's"
+
+The result is a ``NormalizedText``, which ``DictExtractor.cleanup_text``
+knows it doesn't need to normalize again.
+"""
+
+
+class NormalizedText(str):
+    "Text whose whitespace has already been normalized as ``DictExtractor.cleanup_text`` would."
+    __slots__ = ()
+
+
+def truncate_text(text, max_length):
+    """
+    Return normalized `text` cut to at most `max_length` characters.
+
+    Text is cut after the last whole word which fits, unless the first
+    word alone is longer than `max_length`.
+    """
+    if max_length is None or len(text) <= max_length:
+        return text
+    if text[max_length] == " ":
+        return text[:max_length]
+    end = text.rfind(" ", 0, max_length)
+    return text[:end] if end > 0 else text[:max_length]
+
+
+def collect_text(strings, max_length=None):
+    """
+    Return the words of `strings` joined by single spaces, as a ``NormalizedText``.
+
+    The result is the same as normalizing ``" ".join(strings)``, but
+    each string is split into words as it is read, without joining them
+    first. If `max_length` is given, strings are only read until there
+    are `max_length` characters of text, which is then cut by
+    ``truncate_text``.
+
+    Text which is only whitespace is returned as a single space rather
+    than an empty string, so that it is kept (and cleaned up into an
+    empty string) just as the whitespace itself would be.
+    """
+    words = []
+    length = -1
+    index = string = None
+    for index, string in enumerate(strings):
+        split = string.split()
+        words.extend(split)
+        if max_length is not None:
+            length += sum(map(len, split)) + len(split)
+            if length >= max_length:
+                break
+    # whitespace, which " ".join(strings) would have kept
+    if not words and (index or string):
+        return " "
+    return NormalizedText(truncate_text(" ".join(words), max_length))
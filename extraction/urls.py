@@ -0,0 +1,122 @@
+"""
+Resolving the many candidate URLs found on a page against its source URL.
+
+Image-heavy pages produce hundreds of candidate URLs, so rather than
+parsing the source URL again for every one of them, a ``URLNormalizer``
+parses it once and resolves every candidate against it::
+
+    >>> from extraction.urls import URLNormalizer
+    >>> normalize = URLNormalizer("http://lethain.com/digg-v4/")
+    >>> normalize.normalize_all(["/feeds/", "logo.png", "//cdn.example.com/a.png"])
+    ['http://lethain.com/feeds/', 'http://lethain.com/digg-v4/logo.png', 'http://cdn.example.com/a.png']
+
+Results are identical to ``urllib.parse.urljoin``. Absolute URLs and
+plain relative paths, which make up nearly all candidates, take fast
+paths, and anything unusual (schemes, params, whitespace) is handed to
+``urljoin`` itself. Results are memoized, so repeated candidates are
+only resolved once.
+"""
+import urllib.parse
+
+
+ABSOLUTE_PREFIXES = ("http://", "https://", "//")
+
+# characters after which urlsplit finds no netloc, or which it strips
+NETLOC_ENDS = "/?#"
+UNSAFE_CHARACTERS = ("\t", "\r", "\n")
+
+
+def plain_relative(value):
+    "Return True if `value` is a relative path which urljoin would parse into just a path, query and fragment."
+    return (value and value[0] > " " and value[:2] != "//" and ":" not in value and ";" not in value
+            and not any(x in value for x in UNSAFE_CHARACTERS))
+
+
+def plain_absolute(value):
+    "Return True if `value` is an http, https or protocol-relative URL which certainly has a netloc."
+    start = value.find("//") + 2
+    return (len(value) > start and value[start] not in NETLOC_ENDS and value.isascii()
+            and "[" not in value and "]" not in value and not any(x in value for x in UNSAFE_CHARACTERS))
+
+
+class URLNormalizer(object):
+    """
+    Resolves URLs against a single `source_url`, memoizing the results.
+
+    Each result is the URL made absolute if possible, with
+    protocol-relative URLs given an ``http:`` scheme, which is what
+    ``DictExtractor.cleanup_url`` does for each URL on its own.
+    """
+    def __init__(self, source_url=None):
+        self.source_url = source_url
+        self.resolved = {}
+        self._base = None
+
+    @property
+    def base(self):
+        "The source URL split into its components, or None if it can't take the fast path."
+        if self._base is None:
+            scheme, netloc, path, params, query, fragment = urllib.parse.urlparse(self.source_url)
+            if scheme in urllib.parse.uses_relative and scheme in urllib.parse.uses_netloc:
+                self._base = (scheme, netloc, path, params, query)
+            else:
+                self._base = False
+        return self._base
+
+    def join(self, value):
+        "Resolve a plain relative path against the source URL, as urljoin would."
+        scheme, netloc, base_path, params, base_query = self.base
+        path, _, fragment = value.partition("#")
+        path, _, query = path.partition("?")
+
+        if not path:
+            return urllib.parse.urlunparse((scheme, netloc, base_path, params, query or base_query, fragment))
+
+        if path[:1] == "/":
+            segments = path.split("/")
+        else:
+            base_parts = base_path.split("/")
+            if base_parts[-1] != "":
+                # the last item is not a directory, so doesn't affect the resolved path
+                del base_parts[-1]
+            segments = base_parts + path.split("/")
+            segments[1:-1] = filter(None, segments[1:-1])
+
+        resolved_path = []
+        for segment in segments:
+            if segment == "..":
+                if resolved_path:
+                    resolved_path.pop()
+            elif segment != ".":
+                resolved_path.append(segment)
+        if segments[-1] in (".", ".."):
+            resolved_path.append("")
+
+        return urllib.parse.urlunparse((scheme, netloc, "/".join(resolved_path) or "/", "", query, fragment))
+
+    def resolve(self, value):
+        "Return `value` resolved against the source URL, without memoizing."
+        if value.startswith(ABSOLUTE_PREFIXES):
+            if plain_absolute(value):
+                return value
+        elif self.source_url and plain_relative(value) and self.base:
+            return self.join(value)
+
+        if urllib.parse.urlparse(value).netloc or not self.source_url:
+            return value
+        return urllib.parse.urljoin(self.source_url, value)
+
+    def normalize(self, value):
+        "Return `value` resolved against the source URL, with an ``http:`` scheme if it had none."
+        url = self.resolved.get(value)
+        if url is None:
+            url = self.resolve(value)
+            if url.startswith('//'):
+                url = 'http:' + url # MissingSchema fix
+            self.resolved[value] = url
+        return url
+
+    def normalize_all(self, values):
+        "Return a list of each of `values` normalized."
+        normalize = self.normalize
+        return [normalize(x) for x in values]
@@ -5,7 +5,7 @@ setuptools.setup(
     version='0.3',
     author='Will Larson',
     author_email='lethain@gmail.com',
-    packages=['extraction', 'extraction.tests', 'extraction.examples'],
+    packages=['extraction', 'extraction.tests', 'extraction.examples', 'extraction.benchmarks'],
     url='http://pypi.python.org/pypi/extraction/',
     license='LICENSE.txt',
     description='Extract basic info from HTML webpages.',
@@ -14,6 +14,14 @@ setuptools.setup(
         "beautifulsoup4",
         "html5lib",
         ],
+    entry_points={
+        "console_scripts": ["extraction = extraction.cli:main",
+                            "extraction-service = extraction.service:main"],
+        },
+    extras_require={
+        "lxml": ["lxml"],
+        "selectolax": ["selectolax>=0.3.17"],
+        },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",